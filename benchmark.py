@@ -0,0 +1,312 @@
+"""Reproducible benchmarks for the ingest, preview and export hot paths.
+
+    python3 benchmark.py [--corpora small,medium] [--pages 40] [--output results.json]
+    python3 benchmark.py --compare baseline.json --output current.json
+    python3 benchmark.py --cases startup --startup-budget 0.3
+
+A synthetic corpus is generated for each size, mixing PNG, JPEG, WebP and BMP
+files with EXIF orientations and user rotations. Every case runs in a fresh
+subprocess, and Qt uses the offscreen platform, so no display is needed.
+Peak RSS is the kernel's high-water mark of the case's own process, not
+ru_maxrss, which a child inherits from the harness that just generated the
+corpus; export cases also count the pool workers they used. Results are written as JSON for comparison between
+commits.
+
+The startup case times the GUI from its first import to its first painted
+frame and lists the slowest imports; it fails the run when it takes
+longer than --startup-budget.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+CORPORA = {"small": (800, 600), "medium": (3000, 2000), "large": (6000, 4000)}
+FILE_FORMATS = [("png", "PNG"), ("jpg", "JPEG"), ("webp", "WEBP"), ("bmp", "BMP")]
+CASES = ["startup", "thumbnail_cold", "thumbnail_warm", "preview", "export_pdf", "export_gif", "export_jpg"]
+
+
+def make_corpus(directory, pages, width, height):
+    """Writes ``pages`` synthetic images and returns their paths."""
+    from PIL import Image
+
+    # Gradient plus noise: compresses like a photo, not like a flat colour or pure noise
+    base = Image.merge("RGB", [
+        Image.linear_gradient("L").resize((width, height)),
+        Image.effect_noise((width, height), 48),
+        Image.linear_gradient("L").rotate(90).resize((width, height)),
+    ])
+    paths = []
+    for i in range(pages):
+        ext, fmt = FILE_FORMATS[i % len(FILE_FORMATS)]
+        path = os.path.join(directory, f"page_{i:04d}.{ext}")
+        # Landscape and portrait pages, plus EXIF orientations where the format allows
+        img = base if i % 3 else base.transpose(Image.ROTATE_90)
+        params = {"quality": 90} if fmt in ("JPEG", "WEBP") else {}
+        if fmt in ("JPEG", "WEBP"):
+            exif = Image.Exif()
+            exif[0x0112] = [1, 6, 3, 8][i % 4]
+            params["exif"] = exif
+        img.save(path, fmt, **params)
+        paths.append(path)
+    return paths
+
+
+def load_specs(paths):
+    from export_engine import PageSpec
+    from ingest import scan_paths
+
+    return [
+        PageSpec(path, (index % 4) * 90, orientation)
+        for index, (path, _size, _kind, orientation) in enumerate(scan_paths(paths))
+    ]
+
+
+def run_thumbnails(paths, cache_dir):
+    from thumbnails import ThumbnailCache
+
+    # A new instance has an empty memory LRU, so warm runs measure the disk cache
+    cache = ThumbnailCache(cache_dir=cache_dir)
+    for path in paths:
+        cache.get(path)
+
+
+def run_preview(paths):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    import image_merger
+    from ingest import scan_paths
+
+    window = image_merger.ImageMergerApp()
+    window.show()
+    window.queue_model.add_files(list(scan_paths(paths)))
+    app.processEvents()
+    start = time.perf_counter()
+    for row in range(window.queue_model.rowCount()):
+        window.image_list.setCurrentIndex(window.queue_model.index(row))
+        path = window.queue_model.entries[row].path
+        # Previews decode on a thread pool; wait until this one is decoded and shown
+        while image_merger.preview_cache.cached(path) is None and path in window.preview_loaders:
+            app.processEvents()
+            time.sleep(0.001)
+        app.processEvents()
+    return time.perf_counter() - start
+
+
+def run_startup():
+    """Returns (import seconds, seconds until the window's first paint), both from the first Qt import."""
+    start = time.perf_counter()
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtCore import QEvent, QObject
+    from PySide6.QtWidgets import QApplication
+
+    import image_merger
+
+    imported = time.perf_counter()
+    app = QApplication.instance() or QApplication(sys.argv)
+    painted = []
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint:
+                painted.append(True)
+            return False
+
+    window = image_merger.ImageMergerApp()
+    watcher = FirstPaint()
+    window.installEventFilter(watcher)
+    window.show()
+    while not painted:
+        app.processEvents()
+    elapsed = time.perf_counter() - start
+    # Lets the background work started after the first paint wind down
+    window.close()
+    return imported - start, elapsed
+
+
+def parse_importtime(stderr, limit=8):
+    """Cumulative milliseconds of the slowest non-stdlib imports in ``-X importtime`` output."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        # The stdlib is mostly loaded by the interpreter and this script itself
+        if name.split(".")[0] not in sys.stdlib_module_names:
+            times[name] = round(int(cumulative) / 1000, 1)
+    return dict(sorted(times.items(), key=lambda item: -item[1])[:limit])
+
+
+def run_case(case, paths, workers, scratch):
+    """Runs one case in this process and returns its measurements."""
+    import memory
+
+    start = time.perf_counter()
+    if case == "startup":
+        import_s, elapsed = run_startup()
+        return {
+            "wall_s": round(elapsed, 4),
+            "import_s": round(import_s, 4),
+            "pages": 0,
+            "pages_per_sec": None,
+            "peak_rss_mb": round(memory.peak_rss_mb(), 1),
+        }
+    if case.startswith("thumbnail"):
+        run_thumbnails(paths, os.path.join(scratch, "thumbs"))
+        elapsed = time.perf_counter() - start
+        peak = memory.peak_rss_mb()
+    elif case == "preview":
+        elapsed = run_preview(paths)
+        peak = memory.peak_rss_mb()
+    else:
+        from export_engine import export
+
+        fmt = case.split("_", 1)[1]
+        stats = export(fmt, load_specs(paths), os.path.join(scratch, f"out.{fmt}"), workers=workers)
+        elapsed = time.perf_counter() - start
+        # This process during the export, plus the pool workers
+        peak = stats.peak_rss_mb
+    return {
+        "wall_s": round(elapsed, 4),
+        "pages": len(paths),
+        "pages_per_sec": round(len(paths) / elapsed, 2) if elapsed else None,
+        "peak_rss_mb": round(peak, 1),
+    }
+
+
+def spawn_case(case, corpus_dir, paths, workers):
+    manifest = os.path.join(corpus_dir, "manifest.json")
+    with open(manifest, "w") as fp:
+        json.dump(paths, fp)
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    flags = ["-X", "importtime"] if case == "startup" else []
+    out = subprocess.run(
+        [sys.executable, *flags, os.path.abspath(__file__), "--run-case", case,
+         "--manifest", manifest, "--workers", str(workers), "--scratch", corpus_dir],
+        check=True, capture_output=True, text=True, env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    if flags:
+        result["imports_ms"] = parse_importtime(out.stderr)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(baseline, current, threshold):
+    """Prints wall-time deltas against a previous run; returns the number of regressions."""
+    key = lambda r: (r["case"], r["corpus"], r["workers"])
+    before = {key(r): r for r in baseline["results"]}
+    regressions = 0
+    for result in current["results"]:
+        old = before.get(key(result))
+        if not old:
+            continue
+        delta = result["wall_s"] / old["wall_s"] - 1 if old["wall_s"] else 0
+        flag = ""
+        if delta > threshold:
+            flag = "  << REGRESSÃO"
+            regressions += 1
+        print(f"{result['case']:<15} {result['corpus']:<7} w={result['workers']:<3} "
+              f"{old['wall_s']:8.3f}s -> {result['wall_s']:8.3f}s ({delta:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpora", default="small,medium", help=f"any of {','.join(CORPORA)}")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--workers", help="worker counts to run the export cases with (default 1 and all cores)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown counted as a regression (default 10%%)")
+    parser.add_argument("--startup-budget", type=float, default=0.3,
+                        help="seconds allowed from the first import to the first paint (default 0.3)")
+    # Internal: run a single case in this process
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    parser.add_argument("--manifest", help=argparse.SUPPRESS)
+    parser.add_argument("--scratch", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        with open(args.manifest) as fp:
+            paths = json.load(fp)
+        print(json.dumps(run_case(args.run_case, paths, int(args.workers), args.scratch)))
+        return 0
+
+    # Not imported up front: the startup case must load everything itself
+    import PIL
+    from export_engine import DEFAULT_WORKERS
+
+    args.workers = args.workers or f"1,{DEFAULT_WORKERS}"
+    worker_counts = sorted({int(w) for w in args.workers.split(",")})
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "cpus": os.cpu_count(),
+            "pages": args.pages,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": [],
+    }
+    cases = args.cases.split(",")
+    failures = 0
+    if "startup" in cases:
+        # Needs no corpus, so it runs once
+        with tempfile.TemporaryDirectory() as directory:
+            result = spawn_case("startup", directory, [], 1)
+        result.update(case="startup", corpus="-", workers=1)
+        report["results"].append(result)
+        over = result["wall_s"] > args.startup_budget
+        failures += over
+        print(f"{'startup':<15} {'-':<7} w={1:<3} {result['wall_s']:8.3f}s "
+              f"(imports {result['import_s']:.3f}s){'  << ACIMA DO LIMITE' if over else ''}", file=sys.stderr)
+        for name, ms in result["imports_ms"].items():
+            print(f"    {name:<45} {ms:8.1f} ms", file=sys.stderr)
+    corpus_cases = [case for case in cases if case != "startup"]
+    for corpus in args.corpora.split(",") if corpus_cases else []:
+        width, height = CORPORA[corpus]
+        with tempfile.TemporaryDirectory() as directory:
+            paths = make_corpus(directory, args.pages, width, height)
+            for case in corpus_cases:
+                # Only the exporters take a worker count
+                for workers in worker_counts if case.startswith("export") else [1]:
+                    result = spawn_case(case, directory, paths, workers)
+                    result.update(case=case, corpus=corpus, workers=workers)
+                    report["results"].append(result)
+                    print(f"{case:<15} {corpus:<7} w={workers:<3} {result['wall_s']:8.3f}s "
+                          f"{result['pages_per_sec'] or 0:8.1f} p/s {result['peak_rss_mb']:8.1f} MB",
+                          file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2)
+            fp.write("\n")
+    if args.compare:
+        with open(args.compare) as fp:
+            failures += compare(json.load(fp), report, args.threshold)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import hashlib
+import threading
+
+import numpy as np
+from PIL import Image
+
+NEAR_DUPLICATE_BITS = 6  # dHash bits that may differ between near duplicates
+HASH_SIZE = 8  # 8x8 differences, one 64-bit hash
+FLAT_CONTRAST = 8  # grey levels between the darkest and brightest hash pixel of a flat image
+
+# Set bits per byte value, for NumPy versions without bitwise_count
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], np.uint8)
+
+
+def popcount(values):
+    """Number of set bits in each element of a uint64 array."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _POPCOUNT[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def content_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+def dhash(img):
+    """Difference hash of an image, meant for the small thumbnail decode.
+
+    Each bit says whether a pixel of a 9x8 grey version is brighter than its
+    right-hand neighbour, so re-encodes and resizes of the same picture land
+    a few bits apart. Returns None for flat images and for hashes within
+    NEAR_DUPLICATE_BITS of all zeros or all ones, such as plain colours and
+    left-to-right gradients: those bits say nothing about the picture, and
+    would make every such image a near duplicate of the others.
+    """
+    small = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX)
+    pixels = np.asarray(small, np.int16)
+    if pixels.max() - pixels.min() < FLAT_CONTRAST:
+        return None
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    if not NEAR_DUPLICATE_BITS < bits.sum() < bits.size - NEAR_DUPLICATE_BITS:
+        return None
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+class DuplicateIndex:
+    """Finds exact and near duplicates among the images added to it.
+
+    Exact duplicates are found by content hash, computed only for files whose
+    size matches another one. Near duplicates are found by dHash; all hashes
+    live in one NumPy array, so a lookup is a single vectorized XOR and
+    popcount, fast even with tens of thousands of images. Keys are opaque,
+    e.g. the GUI's queue entries.
+    """
+
+    def __init__(self, threshold=NEAR_DUPLICATE_BITS):
+        self.threshold = threshold
+        self.by_size = {}  # size -> [(key, path)] not hashed yet
+        self.by_digest = {}  # content hash -> [key]
+        self.hashes = np.zeros(1024, np.uint64)
+        self.alive = np.zeros(1024, bool)
+        self.keys = []
+        self.removed = set()
+        # add() runs on the GUI's dedupe thread, discard() on the GUI thread
+        self.lock = threading.Lock()
+
+    def _match_digest(self, key, path):
+        digest = content_hash(path)
+        keys = self.by_digest.setdefault(digest, [])
+        original = next((k for k in keys if k not in self.removed), None)
+        keys.append(key)
+        return original
+
+    def _match_exact(self, key, path, size):
+        pending = self.by_size.get(size)
+        if pending is None:
+            # First file of this size: it can't be a duplicate, so don't read it yet
+            self.by_size[size] = [(key, path)]
+            return None
+        for other_key, other_path in pending:
+            self._match_digest(other_key, other_path)
+        pending.clear()
+        return self._match_digest(key, path)
+
+    def _match_near(self, key, phash):
+        count = len(self.keys)
+        match = None
+        if count:
+            distances = popcount(self.hashes[:count] ^ np.uint64(phash))
+            distances[~self.alive[:count]] = HASH_SIZE * HASH_SIZE + 1
+            best = int(distances.argmin())
+            if distances[best] <= self.threshold:
+                match = self.keys[best]
+        if count == len(self.hashes):
+            self.hashes = np.resize(self.hashes, count * 2)
+            self.alive = np.resize(self.alive, count * 2)
+        self.hashes[count] = phash
+        self.alive[count] = True
+        self.keys.append(key)
+        return match
+
+    def add(self, key, path, size, phash=None):
+        """Indexes one image; returns ``(kind, original)`` with kind "exact", "near" or None.
+
+        ``phash`` is the image's dhash, or None if it could not be decoded or
+        has none; such images are only matched exactly.
+        """
+        with self.lock:
+            try:
+                original = self._match_exact(key, path, size)
+            except OSError:
+                original = None
+            if original is not None:
+                return "exact", original
+            if phash is None:
+                return None, None
+            original = self._match_near(key, phash)
+            return ("near", original) if original is not None else (None, None)
+
+    def discard(self, keys):
+        """Forgets removed images, so nothing is flagged as a copy of them later."""
+        with self.lock:
+            self.removed.update(keys)
+            for index, key in enumerate(self.keys):
+                if key in self.removed:
+                    self.alive[index] = False
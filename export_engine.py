@@ -0,0 +1,652 @@
+import functools
+import io
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from gif_encoder import GifWriter, build_palette, quantize_frame
+from jpeg_writer import MAX_JPEG_SIDE, JpegStripWriter
+import memory
+from large_images import BandedImage, decode_at
+from orientation import resolve_orientation
+from pdf_writer import PdfWriter
+from tracing import NULL_TRACER, Tracer
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+PDF_JPEG_QUALITY = 75
+STITCH_JPEG_QUALITY = 90
+GIF_FRAME_DURATION = 500  # milliseconds
+# Portrait page sizes in inches
+PAGE_SIZES = {"a4": (210 / 25.4, 297 / 25.4), "letter": (8.5, 11.0)}
+DEFAULT_DPI = 150
+# Below this many pixels in all, handing pages to worker processes costs more than it saves
+PARALLEL_MIN_PIXELS = 40_000_000
+
+# Exact 90° steps; Image.ROTATE_* turn counter-clockwise
+TRANSPOSES = {90: Image.ROTATE_270, 180: Image.ROTATE_180, 270: Image.ROTATE_90}
+
+# One queue entry: the user's clockwise rotation plus the EXIF orientation read at ingest
+PageSpec = namedtuple("PageSpec", ["path", "rotation", "orientation"], defaults=[0, 1])
+
+
+class ExportCancelled(Exception):
+    """Raised by the export functions when the caller asks them to stop."""
+
+
+class ExportStats:
+    """Summary of a finished export, shown in the status bar."""
+
+    def __init__(self, pages=0, bytes_written=0, peak_rss_mb=0.0, elapsed=0.0, passthrough_pages=0,
+                 outputs=None, cached_pages=0, budget=None):
+        self.pages = pages
+        self.bytes_written = bytes_written
+        self.peak_rss_mb = peak_rss_mb  # of this export, workers included
+        self.elapsed = elapsed
+        self.passthrough_pages = passthrough_pages
+        self.outputs = outputs  # Files written, when the export was split into parts
+        self.cached_pages = cached_pages  # Pages reused from a page cache instead of being encoded
+        self.budget = budget  # size_budget.BudgetResult, for exports fitted into a file size
+
+
+class PageFit:
+    """Output resolution limit: a page size at some DPI, or a maximum pixel dimension.
+
+    Pages are only ever scaled down. The limit is on the long and short side,
+    so it holds whichever way a page ends up rotated. ``scale`` shrinks the
+    pages further, as size budgets do, without changing their printed size.
+    """
+
+    def __init__(self, page_size=None, dpi=None, max_dimension=None, scale=1.0):
+        self.page_size = page_size  # key of PAGE_SIZES
+        self.dpi = dpi or (DEFAULT_DPI if page_size else None)
+        self.max_dimension = max_dimension
+        self.scale = scale
+
+    def scaled(self, scale):
+        """A copy that also shrinks the pages by ``scale``."""
+        return PageFit(self.page_size, self.dpi, self.max_dimension, self.scale * scale)
+
+    def key(self):
+        """What the pixels of an output page depend on, for caches."""
+        return self.box(), self.scale
+
+    def print_dpi(self):
+        """DPI the PDF pages are drawn at, lowered with ``scale`` so they keep their size on paper."""
+        return (self.dpi or 72) * self.scale
+
+    def box(self):
+        """Returns the (long side, short side) limit in pixels, or None for no limit."""
+        if self.page_size:
+            width, height = PAGE_SIZES[self.page_size]
+            return round(height * self.dpi), round(width * self.dpi)
+        if self.max_dimension:
+            return self.max_dimension, self.max_dimension
+        return None
+
+    def target_size(self, size):
+        box = self.box()
+        width, height = size
+        scale = self.scale
+        if box is not None:
+            scale *= min(box[0] / max(width, height), box[1] / min(width, height), 1)
+        if scale >= 1:
+            return size
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def page_points(self, width, height):
+        """Returns the PDF page size in points for an image, turned to match it, or None."""
+        if not self.page_size:
+            return None
+        short, long = sorted(side * 72 for side in PAGE_SIZES[self.page_size])
+        return (long, short) if width > height else (short, long)
+
+
+class EncodedPage:
+    """A page already compressed to JPEG, small enough to send between processes."""
+
+    def __init__(self, data, width, height, mode, passthrough=False, rotate=0):
+        self.data = data
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.passthrough = passthrough  # True when data is the source file, byte for byte
+        self.rotate = rotate  # Clockwise, applied by the PDF viewer through /Rotate
+
+
+def reset_peak_rss():
+    """Starts measuring a new export's peak memory, here and in the pool workers."""
+    global _pool_used
+    _pool_used = False
+    memory.reset_peak([os.getpid(), *_pool_pids()])
+
+
+def peak_rss_mb():
+    """Peak memory since reset_peak_rss(), in MB: this process plus the pool workers it used."""
+    return memory.peak_rss_mb([os.getpid(), *(_pool_pids() if _pool_used else [])])
+
+
+def oriented_size(path, rotation, orientation=1):
+    """Returns the size of a page once rotated, reading only the header."""
+    with Image.open(path) as img:
+        width, height = img.size
+    _mirror, clockwise = resolve_orientation(rotation, orientation)
+    return (height, width) if clockwise in (90, 270) else (width, height)
+
+
+def load_page(path, rotation, orientation=1, tracer=NULL_TRACER, fit=None, banded=False):
+    """Decodes one page at the smallest scale that covers ``fit``, then scales and turns it.
+
+    With ``banded``, a large page that needs neither comes back as a
+    BandedImage, read from the file one band of rows at a time as it is used.
+    """
+    mirror, clockwise = resolve_orientation(rotation, orientation)
+    with tracer.stage("decode"):
+        img = Image.open(path)
+        target = fit.target_size(img.size) if fit else img.size
+        if banded and target == img.size and not mirror and clockwise == 0:
+            page = BandedImage.open(img)
+            if page is not None:
+                img.close()
+                return page
+        img = decode_at(img, target)
+    with tracer.stage("convert"):
+        img = img.convert("RGB")
+    if img.size != target:
+        with tracer.stage("resample"):
+            img = img.resize(target, Image.LANCZOS)
+    if mirror or clockwise != 0:
+        with tracer.stage("rotate"):
+            if mirror:
+                img = img.transpose(Image.FLIP_LEFT_RIGHT)
+            if clockwise != 0:
+                img = img.transpose(TRANSPOSES[clockwise])
+    return img
+
+
+def encode_jpeg(img, quality=PDF_JPEG_QUALITY):
+    buf = io.BytesIO()
+    if isinstance(img, BandedImage):
+        # Compressed strip by strip, so the page is never whole in memory
+        writer = JpegStripWriter(buf, img.width, img.height, quality)
+        for top in range(0, img.height, writer.strip_height):
+            writer.add_strip(img.crop((0, top, img.width, min(top + writer.strip_height, img.height))))
+        writer.close()
+        return EncodedPage(buf.getvalue(), img.width, img.height, "RGB")
+    img.save(buf, "JPEG", quality=quality)
+    return EncodedPage(buf.getvalue(), img.width, img.height, img.mode)
+
+
+def passes_through(img, fit=None):
+    """True if the opened image is a JPEG that can go into a PDF as it is.
+
+    CMYK files are left to the decode path, since Adobe's inverted CMYK would
+    need extra handling in the PDF, and so are files larger than ``fit`` allows.
+    """
+    if img.format != "JPEG" or img.mode not in ("L", "RGB"):
+        return False
+    return not fit or fit.target_size(img.size) == img.size
+
+
+def read_jpeg_passthrough(path, fit=None):
+    """Returns the file as an EncodedPage if it can go into a PDF without decoding.
+
+    Only the header is parsed; see passes_through.
+    """
+    with Image.open(path) as img:
+        if not passes_through(img, fit):
+            return None
+        width, height, mode = img.width, img.height, img.mode
+    with open(path, "rb") as fp:
+        return EncodedPage(fp.read(), width, height, mode, passthrough=True)
+
+
+def prepare_page(path, rotation, orientation=1, encode=False, tracer=NULL_TRACER, transform=None, fit=None,
+                 quality=None):
+    """Decodes and rotates one page, optionally compressing it for the PDF writer.
+
+    ``transform(img, tracer)``, when given, replaces the decoded page with its
+    result; it must be picklable to run in the worker processes. With a
+    PageFit, pages are decoded at reduced resolution and scaled down to it.
+
+    Pages bound for the PDF writer are never rotated in pixels: the rotation
+    goes into the page's /Rotate, and JPEGs are copied as they are unless a
+    ``quality`` is asked for. Only mirrored EXIF orientations, which /Rotate
+    cannot express, are decoded.
+    Without a transform, large pages that need no scaling or turning are
+    returned as a BandedImage instead of being decoded whole.
+    Runs inside the worker processes, so it must stay a module-level function.
+    """
+    tracer.add_bytes(read=os.path.getsize(path))
+    mirror, clockwise = resolve_orientation(rotation, orientation)
+    if encode and not mirror:
+        page = None
+        if quality is None:
+            with tracer.stage("read"):
+                page = read_jpeg_passthrough(path, fit)
+        if page is None:
+            img = load_page(path, 0, tracer=tracer, fit=fit, banded=True)
+            with tracer.stage("encode"):
+                page = encode_jpeg(img, quality or PDF_JPEG_QUALITY)
+            img.close()
+        page.rotate = clockwise
+        return page
+    img = load_page(path, rotation, orientation, tracer, fit, banded=transform is None)
+    if transform is not None:
+        return transform(img, tracer)
+    if encode:
+        with tracer.stage("encode"):
+            page = encode_jpeg(img, quality or PDF_JPEG_QUALITY)
+        img.close()
+        return page
+    return img
+
+
+def prepare_page_traced(index, path, rotation, orientation, encode, transform=None, fit=None, quality=None):
+    """prepare_page with its own tracer, whose events are sent back with the page."""
+    tracer = Tracer(page=index)
+    page = prepare_page(path, rotation, orientation, encode, tracer, transform, fit, quality)
+    return page, tracer.events, tracer.bytes_read
+
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+_pool_used = False  # since the last reset_peak_rss()
+
+
+def _pool_pids():
+    # ProcessPoolExecutor keeps no public list of its processes
+    return list(getattr(_pool, "_processes", None) or ())
+
+
+def worker_pool(workers):
+    """The process pool shared by every export, started once and kept for the next ones.
+
+    Workers are spawned rather than forked, since the GUI process has Qt
+    threads running. A spawned child normally re-runs the parent's main
+    script to rebuild ``__main__``, which for the GUI would load PySide6 into
+    every worker, so the workers are all started at once with a bare stand-in
+    for it. The tasks are module-level functions of the Qt-free modules.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and _pool_workers == workers:
+            return _pool
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        _pool_workers = workers
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            # Each submit to a pool with no idle worker starts a process
+            wait([_pool.submit(os.getpid) for _ in range(workers)])
+        finally:
+            sys.modules["__main__"] = main
+        return _pool
+
+
+def discard_pool():
+    """Drops the shared pool, e.g. after a worker died, so the next export starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def parallel_workers(image_data, workers):
+    """``workers``, or 1 if the pages have too few pixels in all to be worth a process pool."""
+    if workers <= 1:
+        return 1
+    pixels = 0
+    for item in image_data:
+        try:
+            with Image.open(PageSpec(*item).path) as img:
+                pixels += img.width * img.height
+        except (OSError, SyntaxError, ValueError):
+            continue  # reported when the page itself is prepared
+        if pixels >= PARALLEL_MIN_PIXELS:
+            return workers
+    return 1
+
+
+def iter_pages(image_data, progress=None, cancelled=None, workers=1, encode=False, max_in_flight=None,
+               tracer=None, transform=None, fit=None, quality=None):
+    """Yields the prepared pages in queue order, checking for cancellation before each one.
+
+    With more than one worker, and enough pixels to repay it, the pages are
+    prepared by the shared process pool. At most ``max_in_flight`` pages (two
+    per worker by default) are queued or waiting to be consumed at any time,
+    which keeps memory use predictable. When a tracer is given, the stage
+    timings of every page are merged into it.
+    """
+    global _pool_used
+
+    def submit(call, index, item):
+        if tracer is None:
+            return call(prepare_page, *PageSpec(*item), encode, NULL_TRACER, transform, fit, quality)
+        return call(prepare_page_traced, index, *PageSpec(*item), encode, transform, fit, quality)
+
+    def unwrap(result):
+        if tracer is None:
+            return result
+        page, events, bytes_read = result
+        tracer.merge(events, bytes_read)
+        return page
+
+    def finish(done):
+        if tracer is not None:
+            tracer.page_done()
+        if progress:
+            progress(done, total)
+
+    total = len(image_data)
+    workers = parallel_workers(image_data, min(workers, total))
+    if workers <= 1:
+        for index, item in enumerate(image_data):
+            if cancelled and cancelled():
+                raise ExportCancelled()
+            yield unwrap(submit(lambda fn, *args: fn(*args), index, item))
+            finish(index + 1)
+        return
+
+    max_in_flight = max_in_flight or workers * 2
+    pool = worker_pool(workers)
+    _pool_used = True
+    pending = deque()
+    remaining = enumerate(image_data)
+    done = 0
+    try:
+        while True:
+            while len(pending) < max_in_flight:
+                index, item = next(remaining, (None, None))
+                if item is None:
+                    break
+                pending.append(submit(pool.submit, index, item))
+            if not pending:
+                break
+            if cancelled and cancelled():
+                raise ExportCancelled()
+            yield unwrap(pending.popleft().result())
+            done += 1
+            finish(done)
+    except BrokenProcessPool:
+        discard_pool()
+        raise
+    finally:
+        # The pool outlives this export: drop what is queued, let the running pages finish
+        for future in pending:
+            future.cancel()
+        wait(pending)
+
+
+def export_pdf(image_data, save_path, progress=None, cancelled=None, workers=1, tracer=None, fit=None,
+               page_cache=None, quality=None):
+    """Writes one page at a time so only the pages in flight are ever held in memory.
+
+    With a PageFit the pages are printed at its DPI, on its page size if it
+    has one. Pages found in ``page_cache`` (an EncodedPageCache) are not
+    decoded again; the others are encoded by the workers and added to it.
+    With a JPEG ``quality`` every page is encoded at it, JPEGs included.
+    """
+    stages = tracer or NULL_TRACER
+    start = time.perf_counter()
+    passthrough_pages = 0
+    cached_pages = 0
+    dpi = fit.print_dpi() if fit else 72
+    pages = [PageSpec(*item) for item in image_data]
+    keys = [page_cache.key(page, fit, quality) for page in pages] if page_cache else [None] * len(pages)
+    hits = [page_cache.get(key) for key in keys] if page_cache else [None] * len(pages)
+    misses = [page for page, hit in zip(pages, hits) if hit is None]
+    encoded = iter_pages(misses, None, cancelled, workers, True, tracer=tracer, fit=fit, quality=quality)
+    try:
+        with open(save_path, "wb") as fp:
+            writer = PdfWriter(fp)
+            for index, (spec, key, page) in enumerate(zip(pages, keys, hits)):
+                if page is None:
+                    page = next(encoded)
+                    if page_cache:
+                        page_cache.put(key, page)
+                else:
+                    if cancelled and cancelled():
+                        raise ExportCancelled()
+                    cached_pages += 1
+                    stages.page_done()
+                # The same rule as prepare_page, so cached pages can be turned for free
+                mirror, clockwise = resolve_orientation(spec.rotation, spec.orientation)
+                data = page.data
+                if data is None:
+                    with open(spec.path, "rb") as source:
+                        data = source.read()
+                page_size = fit.page_points(page.width, page.height) if fit else None
+                with stages.stage("write", page=index):
+                    writer.add_jpeg_page(
+                        data, page.width, page.height, page.mode, 0 if mirror else clockwise, dpi, page_size
+                    )
+                passthrough_pages += page.passthrough
+                if progress:
+                    progress(index + 1, len(pages))
+            writer.close()
+    finally:
+        encoded.close()
+    stages.add_bytes(written=writer.pos)
+    return ExportStats(
+        len(writer.page_ids), writer.pos, peak_rss_mb(), time.perf_counter() - start, passthrough_pages,
+        cached_pages=cached_pages,
+    )
+
+
+def stitch_layout(pages, fit=None, max_height=MAX_JPEG_SIDE):
+    """Plans a top-to-bottom stitch from the image headers alone.
+
+    Returns the output width, the size of every page and the parts, each a
+    list of ``(page index, first row, end row)`` ranges stacked from the top.
+    A new part starts before any page that would cross ``max_height``; only a
+    page taller than that on its own is cut between parts.
+    """
+    sizes = []
+    for page in pages:
+        size = oriented_size(*page)
+        sizes.append(fit.target_size(size) if fit else size)
+    parts = [[]]
+    used = 0
+    for index, (_width, height) in enumerate(sizes):
+        if used and used + height > max_height >= height:
+            parts.append([])
+            used = 0
+        top = 0
+        while top < height:
+            if used == max_height:
+                parts.append([])
+                used = 0
+            rows = min(height - top, max_height - used)
+            parts[-1].append((index, top, top + rows))
+            top += rows
+            used += rows
+    return max(width for width, _height in sizes), sizes, parts
+
+
+def part_paths(save_path, count):
+    """``name.jpg`` for a single part, ``name_001.jpg``, ``name_002.jpg``... otherwise."""
+    if count == 1:
+        return [save_path]
+    stem, ext = os.path.splitext(save_path)
+    return [f"{stem}_{number:03d}{ext}" for number in range(1, count + 1)]
+
+
+class StitchWriter:
+    """Stitches pages top to bottom as they arrive, writing the JPEG one strip at a time.
+
+    Follows stitch_layout, so pages must be added in queue order. Each page is
+    needed only while its rows are copied into the current strip, so memory
+    stays at about one strip plus the page being added.
+    """
+
+    def __init__(self, save_path, pages, fit=None, tracer=NULL_TRACER, quality=STITCH_JPEG_QUALITY):
+        self.width, _sizes, parts = stitch_layout(pages, fit)
+        self.quality = quality
+        self.paths = part_paths(save_path, len(parts))
+        self.parts = deque(zip(parts, self.paths))
+        self.tracer = tracer
+        self.ranges = deque()  # rows of the current part still to be copied
+        self.fp = None
+        self.writer = None
+        self.strip = None
+        self.y = 0  # rows filled in the current strip
+        self.part_height = 0
+        self.part_top = 0  # first row of the current strip within the part
+        self.bytes_written = 0
+
+    def _open_part(self):
+        part, path = self.parts.popleft()
+        self.ranges = deque(part)
+        self.part_height = sum(end - top for _index, top, end in part)
+        self.part_top = 0
+        self.fp = open(path, "wb")
+        self.writer = JpegStripWriter(self.fp, self.width, self.part_height, self.quality)
+        self._new_strip()
+
+    def _new_strip(self):
+        height = min(self.writer.strip_height, self.part_height - self.part_top)
+        self.strip = Image.new("RGB", (self.width, height), (255, 255, 255))
+        self.y = 0
+
+    def _flush_strip(self):
+        with self.tracer.stage("encode", row=self.part_top):
+            self.writer.add_strip(self.strip)
+        self.part_top += self.strip.height
+        if self.part_top < self.part_height:
+            self._new_strip()
+            return
+        self.writer.close()
+        self.fp.close()
+        self.bytes_written += self.writer.pos
+        self.fp = self.writer = self.strip = None
+
+    def add(self, index, img):
+        while True:
+            if not self.ranges:
+                if not self.parts:
+                    return
+                self._open_part()
+            page, top, end = self.ranges[0]
+            if page != index:
+                return
+            rows = min(end - top, self.strip.height - self.y)
+            with self.tracer.stage("paste", page=index):
+                self.strip.paste(img.crop((0, top, img.width, top + rows)), (0, self.y))
+            self.y += rows
+            if top + rows < end:
+                self.ranges[0] = (page, top + rows, end)
+            else:
+                self.ranges.popleft()
+            if self.y == self.strip.height:
+                self._flush_strip()
+
+    def close(self):
+        pass  # every part is closed as soon as its last strip is written
+
+    def abort(self):
+        """Closes and removes whatever was written so far."""
+        if self.fp:
+            self.fp.close()
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def export_jpg(image_data, save_path, progress=None, cancelled=None, workers=1, tracer=None, fit=None,
+               quality=STITCH_JPEG_QUALITY):
+    """Stitches the pages top to bottom, writing the JPEG one strip at a time.
+
+    Outputs taller than JPEG allows are split into numbered parts.
+    """
+    stages = tracer or NULL_TRACER
+    start = time.perf_counter()
+    pages = [PageSpec(*item) for item in image_data]
+    stitcher = StitchWriter(save_path, pages, fit, stages, quality)
+    decoded = iter_pages(pages, progress, cancelled, workers, tracer=tracer, fit=fit)
+    try:
+        # Not enumerate(), whose reused result tuple would hold each page
+        # while the next one is decoded
+        for index in range(len(pages)):
+            stitcher.add(index, next(decoded))
+        stitcher.close()
+    except BaseException:
+        decoded.close()
+        stitcher.abort()
+        raise
+    stages.add_bytes(written=stitcher.bytes_written)
+    paths = stitcher.paths
+    return ExportStats(
+        len(pages), stitcher.bytes_written, peak_rss_mb(), time.perf_counter() - start,
+        outputs=paths if len(paths) > 1 else None,
+    )
+
+
+def gif_frame_size(pages, fit=None):
+    """The first page's size, scaled down to ``fit``; the default size of GIF frames."""
+    size = oriented_size(*pages[0])
+    return fit.target_size(size) if fit else size
+
+
+def export_gif(image_data, save_path, progress=None, cancelled=None, workers=1, tracer=None,
+               duration=GIF_FRAME_DURATION, frame_size=None, fit=None):
+    """Quantizes every frame to one shared palette in the workers and streams the changes to disk.
+
+    Frames are letterboxed into ``frame_size``, by default the size of the
+    first page, scaled down to ``fit``.
+    """
+    stages = tracer or NULL_TRACER
+    start = time.perf_counter()
+    pages = [PageSpec(*item) for item in image_data]
+    size = tuple(frame_size or gif_frame_size(pages, fit))
+    with stages.stage("palette"):
+        palette = build_palette([page.path for page in pages])
+    quantize = functools.partial(quantize_frame, palette=palette, size=size)
+    with open(save_path, "wb") as fp:
+        writer = GifWriter(fp, size, palette)
+        frames = iter_pages(pages, progress, cancelled, workers, tracer=tracer, transform=quantize, fit=fit)
+        for index, frame in enumerate(frames):
+            with stages.stage("write", page=index):
+                writer.add_frame(frame, duration)
+        writer.close()
+    bytes_written = os.path.getsize(save_path)
+    stages.add_bytes(written=bytes_written)
+    return ExportStats(len(pages), bytes_written, peak_rss_mb(), time.perf_counter() - start)
+
+
+EXPORTERS = {"jpg": export_jpg, "gif": export_gif, "pdf": export_pdf}
+
+
+def export(fmt, image_data, save_path, progress=None, cancelled=None, workers=1, tracer=None, target_bytes=None,
+           **options):
+    """Runs the exporter for ``fmt``, removing the partial file if it fails or is cancelled.
+
+    ``options`` go to the exporter as they are, e.g. ``fit`` or ``duration`` for GIFs.
+    With ``target_bytes`` the JPEG quality and scale are chosen to keep the
+    file under that size; see size_budget.
+    """
+    reset_peak_rss()
+    try:
+        if target_bytes:
+            # Imported here: size_budget builds on this module
+            from size_budget import export_within
+
+            return export_within(
+                fmt, image_data, save_path, target_bytes, progress, cancelled, workers, tracer, **options
+            )
+        return EXPORTERS[fmt](image_data, save_path, progress, cancelled, workers, tracer, **options)
+    except BaseException:
+        if os.path.exists(save_path):
+            os.remove(save_path)
+        raise
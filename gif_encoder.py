@@ -0,0 +1,115 @@
+import struct
+
+import numpy as np
+from PIL import GifImagePlugin, Image, ImageOps
+
+from thumbnails import decode_reduced
+from tracing import NULL_TRACER
+
+PALETTE_COLORS = 255
+TRANSPARENT = 255  # palette index kept out of the palette, marks unchanged pixels
+PALETTE_SAMPLE_FRAMES = 32
+PALETTE_SAMPLE_SIZE = 96  # long side of each sampled frame
+BACKGROUND = (255, 255, 255)
+
+
+def build_palette(paths, sample_frames=PALETTE_SAMPLE_FRAMES, sample_size=PALETTE_SAMPLE_SIZE):
+    """Computes one palette for the whole animation from a subsample of the frames.
+
+    The sampled frames are decoded at thumbnail size and their pixels stacked
+    into a single strip, so the median cut runs once over all of them. The
+    last slot is kept for BACKGROUND, which letterboxed frames are padded with
+    but the samples seldom contain.
+    Returns the RGB triplets as bytes, at most PALETTE_COLORS of them.
+    """
+    step = max(len(paths) / sample_frames, 1)
+    indices = sorted({int(i * step) for i in range(min(len(paths), sample_frames))})
+    pixels = []
+    for index in indices:
+        try:
+            img = decode_reduced(paths[index], sample_size).convert("RGB")
+        except OSError:
+            continue
+        pixels.append(np.asarray(img).reshape(-1, 3))
+    sample = np.concatenate(pixels) if pixels else np.array([BACKGROUND], np.uint8)
+    strip = Image.fromarray(sample[np.newaxis])
+    palette = strip.quantize(PALETTE_COLORS - 1, method=Image.Quantize.MEDIANCUT).getpalette()
+    return bytes(palette[:(PALETTE_COLORS - 1) * 3]) + bytes(BACKGROUND)
+
+
+def quantize_frame(img, tracer=NULL_TRACER, palette=b"", size=None):
+    """Letterboxes ``img`` into ``size`` and maps it to ``palette``.
+
+    Returns the palette indices along with the RGB pixels they came from.
+    Runs inside the export worker processes, bound with functools.partial.
+    """
+    if size and img.size != tuple(size):
+        with tracer.stage("fit"):
+            img = ImageOps.pad(img, size, Image.LANCZOS, color=BACKGROUND)
+    with tracer.stage("quantize"):
+        # Only the real colours are in this palette, so TRANSPARENT is never picked
+        palette_img = Image.new("P", (1, 1))
+        palette_img.putpalette(palette)
+        frame = img.quantize(palette=palette_img, dither=Image.Dither.FLOYDSTEINBERG)
+    return np.asarray(frame), np.asarray(img)
+
+
+class GifWriter:
+    """Streams frames indexed into one global palette to ``fp``.
+
+    After the first frame only the bounding box of the pixels that changed is
+    stored, with the unchanged ones inside it transparent. Changes are found
+    on the RGB pixels: dithering spreads a small edit over the rest of the
+    indexed frame, which would make every box nearly full size. A frame
+    identical to the previous one is not stored at all; its duration is added
+    to the previous frame, which is why each frame is written one call late.
+    """
+
+    def __init__(self, fp, size, palette, loop=0):
+        self.fp = fp
+        self.size = size
+        self.previous = None
+        self.pending = None  # (region, offset, duration, transparency)
+        self.frames = 0
+        width, height = size
+        colors = palette + bytes(768 - len(palette))
+        # 256-entry global colour table, 8 bits per primary
+        fp.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0xF7, TRANSPARENT, 0) + colors)
+        fp.write(b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+
+    def add_frame(self, frame, duration):
+        """Adds the ``(indices, pixels)`` pair returned by quantize_frame."""
+        indices, pixels = frame
+        if self.previous is None:
+            region, offset, transparency = indices, (0, 0), None
+        else:
+            changed = (pixels != self.previous).any(axis=2)
+            rows = np.flatnonzero(changed.any(axis=1))
+            if not rows.size:
+                region, offset, previous_duration, transparency = self.pending
+                self.pending = (region, offset, previous_duration + duration, transparency)
+                return
+            cols = np.flatnonzero(changed.any(axis=0))
+            top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+            region = np.where(changed[top:bottom, left:right], indices[top:bottom, left:right], TRANSPARENT)
+            offset, transparency = (int(left), int(top)), TRANSPARENT
+        self._flush()
+        self.pending = (region, offset, duration, transparency)
+        self.previous = pixels
+
+    def _flush(self):
+        if self.pending is None:
+            return
+        region, offset, duration, transparency = self.pending
+        frame = Image.fromarray(np.ascontiguousarray(region, np.uint8), "P")
+        # Disposal 1 keeps the previous frame under the transparent pixels
+        params = {"duration": duration, "disposal": 1}
+        if transparency is not None:
+            params["transparency"] = transparency
+        self.fp.write(b"".join(GifImagePlugin.getdata(frame, offset, **params)))
+        self.frames += 1
+        self.pending = None
+
+    def close(self):
+        self._flush()
+        self.fp.write(b";")
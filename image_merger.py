@@ -1,110 +1,360 @@
 import sys
 import os
+import functools
+import queue
+from collections import OrderedDict
+
+if getattr(sys, "frozen", False):
+    import multiprocessing
+
+    # In the PyInstaller build, export workers start this executable again;
+    # send them off to their task before Qt is loaded
+    multiprocessing.freeze_support()
+
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
-    QPushButton, QFrame, QFileDialog, QListWidget, QListWidgetItem,
-    QAbstractItemView, QGraphicsDropShadowEffect, QSizeGrip
+    QPushButton, QFrame, QFileDialog, QListView, QStyle, QStyledItemDelegate,
+    QAbstractItemView, QGraphicsDropShadowEffect, QSpinBox, QComboBox, QCheckBox
+)
+from PySide6.QtCore import (
+    Qt, QSize, QPropertyAnimation, QEasingCurve, QPoint, Signal, Property, QRect,
+    QObject, QRunnable, QThreadPool, QAbstractListModel, QModelIndex, QEvent, QTimer
+)
+from PySide6.QtGui import (
+    QIcon, QPixmap, QImage, QColor, QCursor, QDragEnterEvent, QDropEvent, QPainter, QFont, QTransform
 )
-from PySide6.QtCore import Qt, QSize, QPropertyAnimation, QEasingCurve, QPoint, Signal, Property, QRect
-from PySide6.QtGui import QIcon, QPixmap, QColor, QDragEnterEvent, QDropEvent, QPainter, QAction, QFont, QTransform
-from PIL import Image
 
-# --- Custom Widgets ---
+# Pillow, NumPy and the export engine are imported where they are first
+# used, not here: together they take longer to load than Qt itself, and none
+# of them is needed to show the window. ImportWarmer loads them once it is up.
+from orientation import resolve_orientation
+from thumbnails import ThumbnailCache
+from tracing import NULL_TRACER, Tracer
 
-class ImageCardWidget(QFrame):
-    """Custom widget for the list items, similar to Dash.py cards."""
-    # Signal to notify when rotation changes
-    rotationChanged = Signal()
+thumbnail_cache = ThumbnailCache()
 
-    def __init__(self, file_path, parent=None):
-        super().__init__(parent)
-        self.file_path = file_path
+PREVIEW_SIZE = 1600  # long side of the preview decodes, about a screen's worth
+PREVIEW_PREFETCH = 2  # rows decoded ahead on each side of the selection
+# Memory only: at most 12 x 1600 x 1200 x 4 bytes, about 90 MB
+preview_cache = ThumbnailCache(PREVIEW_SIZE, capacity=12, cache_dir=None)
+
+# Set IMAGE_MERGER_TRACE=/path/trace.json to record previews, thumbnails and
+# exports of the whole session as a Chrome trace, written when the window closes.
+TRACE_PATH = os.environ.get("IMAGE_MERGER_TRACE")
+session_tracer = Tracer() if TRACE_PATH else NULL_TRACER
+
+# Choices of the export resolution selector, as export_engine.PageFit arguments
+EXPORT_RESOLUTIONS = [
+    ("Original", None),
+    ("A4 · 150 dpi", {"page_size": "a4", "dpi": 150}),
+    ("A4 · 300 dpi", {"page_size": "a4", "dpi": 300}),
+    ("Carta · 150 dpi", {"page_size": "letter", "dpi": 150}),
+    ("Máx. 2000 px", {"max_dimension": 2000}),
+]
+# Size budgets for PDF and JPG exports, in decimal bytes as upload portals count them
+EXPORT_SIZE_LIMITS = [
+    ("Sem limite", None),
+    ("25 MB", 25_000_000),
+    ("10 MB", 10_000_000),
+    ("5 MB", 5_000_000),
+    ("2 MB", 2_000_000),
+]
+
+@functools.lru_cache(maxsize=None)
+def shared_page_cache():
+    """PDF pages encoded by earlier exports; a re-export only encodes what changed."""
+    from page_cache import EncodedPageCache
+
+    return EncodedPageCache()
+
+def to_qpixmap(img):
+    """Converts an RGBA PIL image into a QPixmap."""
+    data = img.tobytes()
+    qimage = QImage(data, img.width, img.height, img.width * 4, QImage.Format_RGBA8888)
+    return QPixmap.fromImage(qimage)
+
+# --- Queue Model ---
+
+LARGE_FILE_BYTES = 1024 * 1024  # smaller files are not worth a header read to look for huge images
+INGEST_BATCH = 200  # minimum rows inserted per UI tick while a drop is being scanned
+THUMB_PIXMAP_LIMIT = 1000  # thumbnails kept as pixmaps; the rest live in thumbnail_cache
+
+class QueueEntry:
+    """Compact per-row record of the image queue."""
+    __slots__ = ("path", "rotation", "size", "kind", "orientation", "thumb", "duplicate", "duplicate_of", "large")
+
+    def __init__(self, path, size, kind, orientation=1, large=None):
+        self.path = path
         self.rotation = 0  # Current rotation in degrees
-        self.setObjectName("ImageCard")
-        self.setFixedHeight(85)
-        self.setStyleSheet("""
-            #ImageCard {
-                background-color: #2d2d2d;
-                border-radius: 8px;
-                border: 1px solid #3d3d3d;
-            }
-            #ImageCard:hover {
-                background-color: #353535;
-                border: 1px solid #0078d4;
-            }
-        """)
-        
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(10, 5, 10, 5)
-        
+        self.size = size
+        self.kind = kind  # Format detected from the magic bytes, e.g. "jpeg"
+        self.orientation = orientation  # EXIF Orientation, read once at ingest
+        self.thumb = None  # Unrotated QPixmap, loaded only once the row is painted
+        self.duplicate = None  # "exact" or "near" once the dedupe pass finds an earlier copy
+        self.duplicate_of = None  # That earlier QueueEntry
+        self.large = large  # ("large" or "too_large", megapixels) from large_images.classify
+
+class ThumbnailSignals(QObject):
+    loaded = Signal(object, object)
+
+class ThumbnailLoader(QRunnable):
+    def __init__(self, entry):
+        super().__init__()
+        self.entry = entry
+        self.signals = ThumbnailSignals()
+
+    def run(self):
+        with session_tracer.stage("thumbnail"):
+            thumb = thumbnail_cache.get(self.entry.path)
+        self.signals.loaded.emit(self.entry, thumb)
+
+class PreviewSignals(QObject):
+    loaded = Signal(str)
+
+class PreviewLoader(QRunnable):
+    """Decodes one preview into preview_cache, unless it stopped being wanted while queued."""
+
+    def __init__(self, path, wanted):
+        super().__init__()
+        self.path = path
+        self.wanted = wanted
+        self.signals = PreviewSignals()
+
+    def run(self):
+        if self.wanted(self.path):
+            with session_tracer.stage("preview_decode"):
+                preview_cache.get(self.path)
+        self.signals.loaded.emit(self.path)
+
+class ImageQueueModel(QAbstractListModel):
+    """Holds the queue as plain QueueEntry records instead of one widget per file."""
+    thumbnailReady = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries = []
+        self.thumbs = OrderedDict()  # id(entry) -> entry, least recently painted first
+        self.loaders = {}  # id(entry) -> ThumbnailLoader, kept alive until it reports back
+        self.thumb_pool = QThreadPool(self)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entries[index.row()]
+        if role == Qt.DisplayRole:
+            return os.path.basename(entry.path)
+        if role == Qt.UserRole:
+            return entry
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def add_files(self, files):
+        """Appends ``(path, size, kind, orientation[, large])`` tuples, as produced by ingest.scan_paths."""
+        entries = [QueueEntry(*item) for item in files]
+        if not entries:
+            return entries
+        first = len(self.entries)
+        self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+        self.entries.extend(entries)
+        self.endInsertRows()
+        return entries
+
+    def remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        entry = self.entries.pop(row)
+        self.endRemoveRows()
+        self.thumbs.pop(id(entry), None)
+        self.forget_originals({entry})
+
+    def remove_entries(self, doomed):
+        """Removes a set of entries in one reset, instead of one row at a time."""
+        self.beginResetModel()
+        self.entries = [entry for entry in self.entries if entry not in doomed]
+        for entry in doomed:
+            self.thumbs.pop(id(entry), None)
+        self.endResetModel()
+        self.forget_originals(doomed)
+
+    def forget_originals(self, removed):
+        """Unflags the copies of removed entries; they are no longer duplicates of anything."""
+        for entry in self.entries:
+            if entry.duplicate_of in removed:
+                entry.duplicate = entry.duplicate_of = None
+
+    def move_row(self, source, target):
+        """Moves ``source`` so it ends up before the row currently at ``target``."""
+        if target in (source, source + 1):
+            return
+        self.beginMoveRows(QModelIndex(), source, source, QModelIndex(), target)
+        entry = self.entries.pop(source)
+        self.entries.insert(target - 1 if target > source else target, entry)
+        self.endMoveRows()
+
+    def rotate_row(self, row, angle):
+        entry = self.entries[row]
+        entry.rotation = (entry.rotation + angle) % 360
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def clear(self):
+        self.beginResetModel()
+        self.entries = []
+        self.thumbs.clear()
+        self.endResetModel()
+
+    def thumbnail(self, entry):
+        """Returns the entry's thumbnail, queueing a background load on first use."""
+        if entry.thumb is not None:
+            self.thumbs.move_to_end(id(entry))
+            return entry.thumb
+        if id(entry) not in self.loaders:
+            loader = ThumbnailLoader(entry)
+            loader.signals.loaded.connect(self.thumbnail_loaded)
+            self.loaders[id(entry)] = loader
+            self.thumb_pool.start(loader)
+        return None
+
+    def thumbnail_loaded(self, entry, thumb):
+        self.loaders.pop(id(entry), None)
+        if thumb is None:
+            return
+        entry.thumb = to_qpixmap(thumb).scaled(65, 65, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.thumbs[id(entry)] = entry
+        while len(self.thumbs) > THUMB_PIXMAP_LIMIT:
+            _, old = self.thumbs.popitem(last=False)
+            old.thumb = None
+        self.thumbnailReady.emit()
+
+class ImageCardDelegate(QStyledItemDelegate):
+    """Paints the queue cards and handles their rotate/remove buttons."""
+    rotateClicked = Signal(int, int)
+    removeClicked = Signal(int)
+
+    CARD_HEIGHT = 85
+    BUTTON_SIZE = 26
+
+    def sizeHint(self, option, index):
+        return QSize(0, self.CARD_HEIGHT)
+
+    def button_rects(self, rect):
+        """Rotate left, rotate right and remove buttons, right-aligned in the card."""
+        size = self.BUTTON_SIZE
+        top = rect.top() + (rect.height() - size) // 2
+        right = rect.right() - 10
+        return [QRect(right - size * (3 - i) - 5 * (2 - i), top, size, size) for i in range(3)]
+
+    def paint(self, painter, option, index):
+        entry = index.data(Qt.UserRole)
+        rect = option.rect.adjusted(1, 1, -1, -1)
+        highlighted = option.state & (QStyle.State_MouseOver | QStyle.State_Selected)
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QColor("#0078d4") if highlighted else QColor("#3d3d3d"))
+        painter.setBrush(QColor("#353535") if highlighted else QColor("#2d2d2d"))
+        painter.drawRoundedRect(rect, 8, 8)
+
         # Thumbnail
-        self.thumb_label = QLabel()
-        self.thumb_label.setFixedSize(65, 65)
-        self.thumb_label.setStyleSheet("border-radius: 4px; background-color: #1e1e1e;")
-        self.update_thumbnail()
-        self.thumb_label.setAlignment(Qt.AlignCenter)
-        
+        thumb_rect = QRect(rect.left() + 10, rect.top() + (rect.height() - 65) // 2, 65, 65)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor("#1e1e1e"))
+        painter.drawRoundedRect(thumb_rect, 4, 4)
+        thumb = index.model().thumbnail(entry)
+        if thumb is not None:
+            painter.save()
+            painter.translate(thumb_rect.center())
+            mirror, clockwise = resolve_orientation(entry.rotation, entry.orientation)
+            painter.rotate(clockwise)
+            if mirror:
+                painter.scale(-1, 1)
+            painter.drawPixmap(-thumb.width() // 2, -thumb.height() // 2, thumb)
+            painter.restore()
+
         # Info
-        info_layout = QVBoxLayout()
-        info_layout.setSpacing(2)
-        self.name_label = QLabel(os.path.basename(file_path))
-        self.name_label.setStyleSheet("color: #e0e0e0; font-weight: bold; font-size: 11px;")
-        
-        size = os.path.getsize(file_path) / 1024
-        size_label = QLabel(f"{size:.1f} KB")
-        size_label.setStyleSheet("color: #888888; font-size: 9px;")
-        
-        info_layout.addWidget(self.name_label)
-        info_layout.addWidget(size_label)
-        info_layout.addStretch()
-        
-        # Controls Layout (Rotate + Remove)
-        controls_layout = QHBoxLayout()
-        controls_layout.setSpacing(5)
-        
-        self.btn_rotate_left = QPushButton("⟲")
-        self.btn_rotate_right = QPushButton("⟳")
-        self.btn_remove = QPushButton("✕")
-        
-        for btn in [self.btn_rotate_left, self.btn_rotate_right, self.btn_remove]:
-            btn.setFixedSize(26, 26)
-            btn.setCursor(Qt.PointingHandCursor)
-            if btn == self.btn_remove:
-                btn.setStyleSheet("""
-                    QPushButton { background: transparent; color: #666666; border-radius: 13px; font-weight: bold; }
-                    QPushButton:hover { background: #ff4444; color: white; }
-                """)
+        buttons = self.button_rects(rect)
+        text_left = thumb_rect.right() + 12
+        text_width = buttons[0].left() - 10 - text_left
+        font = QFont(option.font)
+        font.setPixelSize(11)
+        font.setBold(True)
+        painter.setFont(font)
+        painter.setPen(QColor("#e0e0e0"))
+        name = painter.fontMetrics().elidedText(os.path.basename(entry.path), Qt.ElideMiddle, text_width)
+        painter.drawText(QRect(text_left, thumb_rect.top(), text_width, 18), Qt.AlignLeft | Qt.AlignVCenter, name)
+        font.setPixelSize(9)
+        font.setBold(False)
+        painter.setFont(font)
+        painter.setPen(QColor("#888888"))
+        painter.drawText(
+            QRect(text_left, thumb_rect.top() + 18, text_width, 14),
+            Qt.AlignLeft | Qt.AlignVCenter, f"{entry.size / 1024:.1f} KB"
+        )
+        if entry.duplicate:
+            font.setBold(True)
+            painter.setFont(font)
+            painter.setPen(QColor("#ffb300"))
+            painter.drawText(
+                QRect(text_left, thumb_rect.top() + 34, text_width, 14),
+                Qt.AlignLeft | Qt.AlignVCenter, "DUPLICADA" if entry.duplicate == "exact" else "SEMELHANTE"
+            )
+        if entry.large:
+            kind, megapixels = entry.large
+            font.setBold(True)
+            painter.setFont(font)
+            painter.setPen(QColor("#ff4444" if kind == "too_large" else "#0078d4"))
+            label = "ACIMA DO LIMITE" if kind == "too_large" else "GRANDE"
+            painter.drawText(
+                QRect(text_left, thumb_rect.top() + 48, text_width, 14),
+                Qt.AlignLeft | Qt.AlignVCenter, f"{label} · {megapixels:.0f} MP"
+            )
+
+        # Controls (Rotate + Remove)
+        cursor = option.widget.mapFromGlobal(QCursor.pos()) if option.widget else QPoint(-1, -1)
+        for i, (btn_rect, label) in enumerate(zip(buttons, ["⟲", "⟳", "✕"])):
+            hovered = btn_rect.contains(cursor)
+            if i == 2:
+                painter.setBrush(QColor("#ff4444") if hovered else Qt.transparent)
+                painter.setPen(QColor("white") if hovered else QColor("#666666"))
             else:
-                btn.setStyleSheet("""
-                    QPushButton { background: #3d3d3d; color: #cccccc; border-radius: 13px; font-size: 14px; border: none; }
-                    QPushButton:hover { background: #0078d4; color: white; }
-                """)
-        
-        self.btn_rotate_left.clicked.connect(lambda: self.rotate_image(-90))
-        self.btn_rotate_right.clicked.connect(lambda: self.rotate_image(90))
-        
-        controls_layout.addWidget(self.btn_rotate_left)
-        controls_layout.addWidget(self.btn_rotate_right)
-        controls_layout.addWidget(self.btn_remove)
-        
-        layout.addWidget(self.thumb_label)
-        layout.addLayout(info_layout)
-        layout.addStretch()
-        layout.addLayout(controls_layout)
+                painter.setBrush(QColor("#0078d4") if hovered else QColor("#3d3d3d"))
+                painter.setPen(QColor("white") if hovered else QColor("#cccccc"))
+            pen_color = painter.pen().color()
+            painter.setPen(Qt.NoPen)
+            painter.drawEllipse(btn_rect)
+            painter.setPen(pen_color)
+            font.setPixelSize(14 if i < 2 else 11)
+            font.setBold(i == 2)
+            painter.setFont(font)
+            painter.drawText(btn_rect, Qt.AlignCenter, label)
+        painter.restore()
 
-    def rotate_image(self, angle):
-        self.rotation = (self.rotation + angle) % 360
-        self.update_thumbnail()
-        self.rotationChanged.emit() # Emit signal to update main preview
+    def editorEvent(self, event, model, option, index):
+        if event.type() not in (QEvent.MouseButtonPress, QEvent.MouseButtonRelease):
+            return False
+        if event.button() != Qt.LeftButton:
+            return False
+        for i, btn_rect in enumerate(self.button_rects(option.rect.adjusted(1, 1, -1, -1))):
+            if btn_rect.contains(event.position().toPoint()):
+                # Swallow the press too, so a button click neither selects nor drags the row
+                if event.type() == QEvent.MouseButtonRelease:
+                    if i == 2:
+                        self.removeClicked.emit(index.row())
+                    else:
+                        self.rotateClicked.emit(index.row(), -90 if i == 0 else 90)
+                return True
+        return False
 
-    def update_thumbnail(self):
-        pixmap = QPixmap(self.file_path)
-        if self.rotation != 0:
-            transform = QTransform().rotate(self.rotation)
-            pixmap = pixmap.transformed(transform, Qt.SmoothTransformation)
-        
-        scaled_pixmap = pixmap.scaled(65, 65, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.thumb_label.setPixmap(scaled_pixmap)
+# --- Custom Widgets ---
 
 class AnimatedButton(QPushButton):
     def __init__(self, text, parent=None, primary=False):
@@ -195,53 +445,244 @@ class TitleBar(QFrame):
             self.parent.move(self.parent.pos() + delta)
             self.start_pos = event.globalPos()
 
-class ImageListWidget(QListWidget):
+class ImageListView(QListView):
+    # Files and folders dropped from outside; the window scans them
+    filesDropped = Signal(list)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setDragDropMode(QAbstractItemView.InternalMove)
         self.setSelectionMode(QAbstractItemView.SingleSelection)
         self.setAcceptDrops(True)
         self.setSpacing(8)
+        # Every card has the same height, which lets Qt skip per-row layout
+        self.setUniformItemSizes(True)
+        self.setMouseTracking(True)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
         self.setObjectName("ImageList")
         self.setStyleSheet("""
-            QListWidget {
+            QListView {
                 background-color: #1e1e1e;
                 border: 2px dashed #333333;
                 border-radius: 10px;
                 padding: 10px;
             }
-            QListWidget::item {
-                background: transparent;
-                border: none;
-            }
         """)
 
+    def mouseMoveEvent(self, event):
+        # Repaint the card under the cursor so its buttons can show their hover state
+        index = self.indexAt(event.position().toPoint())
+        if index.isValid():
+            self.viewport().update(self.visualRect(index))
+        super().mouseMoveEvent(event)
+
     def dragEnterEvent(self, event: QDragEnterEvent):
         if event.mimeData().hasUrls():
             event.acceptProposedAction()
-            self.setStyleSheet("QListWidget { background-color: #252526; border: 2px dashed #0078d4; border-radius: 10px; padding: 10px; }")
+            self.setStyleSheet("QListView { background-color: #252526; border: 2px dashed #0078d4; border-radius: 10px; padding: 10px; }")
         else:
             super().dragEnterEvent(event)
 
     def dragLeaveEvent(self, event):
-        self.setStyleSheet("QListWidget { background-color: #1e1e1e; border: 2px dashed #333333; border-radius: 10px; padding: 10px; }")
+        self.setStyleSheet("QListView { background-color: #1e1e1e; border: 2px dashed #333333; border-radius: 10px; padding: 10px; }")
         super().dragLeaveEvent(event)
 
     def dropEvent(self, event: QDropEvent):
-        self.setStyleSheet("QListWidget { background-color: #1e1e1e; border: 2px dashed #333333; border-radius: 10px; padding: 10px; }")
+        self.setStyleSheet("QListView { background-color: #1e1e1e; border: 2px dashed #333333; border-radius: 10px; padding: 10px; }")
         if event.mimeData().hasUrls():
             files = [u.toLocalFile() for u in event.mimeData().urls()]
-            self.parent().add_images(files)
+            self.filesDropped.emit(files)
             event.acceptProposedAction()
+        elif event.source() is self:
+            # Move the record ourselves; ignoring the action stops Qt from
+            # removing the source row afterwards.
+            self.move_selected_to(event.position().toPoint())
+            event.setDropAction(Qt.IgnoreAction)
+            event.accept()
         else:
             super().dropEvent(event)
 
+    def move_selected_to(self, pos):
+        selected = self.selectedIndexes()
+        if not selected:
+            return
+        model = self.model()
+        target = self.indexAt(pos)
+        if target.isValid():
+            row = target.row()
+            if pos.y() > self.visualRect(target).center().y():
+                row += 1
+        else:
+            row = model.rowCount()
+        source = selected[0].row()
+        model.move_row(source, row)
+        new_row = row - 1 if row > source else row
+        self.setCurrentIndex(model.index(min(new_row, model.rowCount() - 1)))
+
+class IngestWorker(QRunnable):
+    """Scans dropped files and folders off the GUI thread.
+
+    Results go into a plain queue that the window drains in batches, so a
+    huge archive does not flood the event loop with one signal per file.
+    """
+
+    def __init__(self, paths):
+        super().__init__()
+        self.paths = paths
+        self.found = queue.SimpleQueue()
+        self.done = False
+        self._cancel_requested = False
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def run(self):
+        from ingest import scan_paths
+        from large_images import classify
+
+        try:
+            for item in scan_paths(self.paths, lambda: self._cancel_requested):
+                large = None
+                if item[1] >= LARGE_FILE_BYTES:
+                    kind, megapixels = classify(item[0])
+                    large = (kind, megapixels) if kind else None
+                self.found.put((*item, large))
+        finally:
+            # Even after an error, or drain_ingest would wait on this worker forever
+            self.done = True
+
+class DedupeWorker(QRunnable):
+    """Indexes newly queued files for duplicates off the GUI thread.
+
+    The perceptual hash comes from the thumbnail decode, which the card needs
+    anyway and thumbnail_cache keeps, so no file is decoded a second time.
+    Duplicates found go into a plain queue drained by the window.
+    """
+
+    def __init__(self, entries, index):
+        super().__init__()
+        self.entries = entries
+        self.index = index
+        self.found = queue.SimpleQueue()
+        self.done = False
+        self._cancel_requested = False
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def run(self):
+        from dedupe import dhash
+
+        for entry in self.entries:
+            if self._cancel_requested:
+                break
+            with session_tracer.stage("dedupe"):
+                thumb = thumbnail_cache.get(entry.path)
+                phash = dhash(thumb) if thumb is not None else None
+                kind, original = self.index.add(entry, entry.path, entry.size, phash)
+            if kind:
+                self.found.put((entry, kind, original))
+        self.done = True
+
+class ImportWarmer(QRunnable):
+    """Loads the modules the window imports lazily, in the background once it is on screen.
+
+    By the time the first files are dropped or an export starts, their
+    imports are a dictionary lookup instead of a pause on the GUI thread.
+    """
+
+    def run(self):
+        import dedupe
+        import export_engine
+        import ingest
+        import multi_export
+        import page_cache
+
+class ExportSignals(QObject):
+    progress = Signal(int, int)
+    finished = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+class ExportWorker(QRunnable):
+    """Runs an export on the global thread pool, reporting back through signals.
+
+    ``save_path`` may also be a dict of format -> path, written from one
+    decode with export_many; ``finished`` then carries a dict of stats.
+    """
+
+    def __init__(self, fmt, image_data, save_path, workers=1, options=None):
+        super().__init__()
+        self.fmt = fmt
+        self.image_data = image_data
+        self.save_path = save_path
+        self.workers = workers
+        self.options = options or {}
+        self.tracer = Tracer()
+        self.signals = ExportSignals()
+        self._cancel_requested = False
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def run(self):
+        from export_engine import ExportCancelled, export
+        from multi_export import export_many
+
+        try:
+            if isinstance(self.save_path, dict):
+                stats = export_many(
+                    self.save_path, self.image_data,
+                    progress=self.signals.progress.emit,
+                    cancelled=lambda: self._cancel_requested,
+                    workers=self.workers,
+                    tracer=self.tracer,
+                    **self.options
+                )
+            else:
+                stats = export(
+                    self.fmt, self.image_data, self.save_path,
+                    progress=self.signals.progress.emit,
+                    cancelled=lambda: self._cancel_requested,
+                    workers=self.workers,
+                    tracer=self.tracer,
+                    **self.options
+                )
+        except ExportCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(stats)
+
 class ImageMergerApp(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowFlags(Qt.FramelessWindowHint)
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.resize(1100, 850)
+        self.export_worker = None
+        self.ingest_workers = []
+        # One scanner at a time, so files land in the order they were dropped
+        self.ingest_pool = QThreadPool(self)
+        self.ingest_pool.setMaxThreadCount(1)
+        self.ingest_timer = QTimer(self)
+        self.ingest_timer.setInterval(16)
+        self.ingest_timer.timeout.connect(self.drain_ingest)
+        self.dedupe_index = None  # created with the first files, see start_dedupe
+        self.dedupe_workers = []
+        # One indexer at a time, so the first copy in queue order is the original
+        self.dedupe_pool = QThreadPool(self)
+        self.dedupe_pool.setMaxThreadCount(1)
+        self.dedupe_timer = QTimer(self)
+        self.dedupe_timer.setInterval(100)
+        self.dedupe_timer.timeout.connect(self.drain_dedupe)
+        self.preview_pool = QThreadPool(self)
+        self.preview_pool.setMaxThreadCount(2)
+        self.preview_loaders = {}  # path -> PreviewLoader, kept alive until it reports back
+        self.preview_paths = set()  # selection and its neighbours; anything else is skipped
+        self.preview_source = (None, None)  # (image, QPixmap) of the last preview shown
+        self.setup_finished = False  # see finish_setup
         
         # Set Application Icon
         icon_path = os.path.join(os.path.dirname(__file__), "app_icon.png")
@@ -263,13 +704,6 @@ class ImageMergerApp(QWidget):
             }
         """)
         
-        shadow = QGraphicsDropShadowEffect(self)
-        shadow.setBlurRadius(30)
-        shadow.setXOffset(0)
-        shadow.setYOffset(0)
-        shadow.setColor(QColor(0, 0, 0, 200))
-        self.main_frame.setGraphicsEffect(shadow)
-        
         layout = QVBoxLayout(self)
         layout.setContentsMargins(10, 10, 10, 10)
         layout.addWidget(self.main_frame)
@@ -302,8 +736,16 @@ class ImageMergerApp(QWidget):
         header_layout.addWidget(self.count_label)
         left_panel.addLayout(header_layout)
         
-        self.image_list = ImageListWidget(self)
-        self.image_list.itemSelectionChanged.connect(self.update_preview)
+        self.queue_model = ImageQueueModel(self)
+        self.card_delegate = ImageCardDelegate(self)
+        self.image_list = ImageListView(self)
+        self.image_list.setModel(self.queue_model)
+        self.image_list.setItemDelegate(self.card_delegate)
+        self.image_list.selectionModel().selectionChanged.connect(self.update_preview)
+        self.queue_model.thumbnailReady.connect(self.image_list.viewport().update)
+        self.card_delegate.rotateClicked.connect(self.rotate_item)
+        self.card_delegate.removeClicked.connect(self.remove_item)
+        self.image_list.filesDropped.connect(self.add_images)
         left_panel.addWidget(self.image_list)
         
         btn_layout = QHBoxLayout()
@@ -311,7 +753,11 @@ class ImageMergerApp(QWidget):
         self.btn_add.clicked.connect(self.browse_images)
         self.btn_clear = AnimatedButton("🗑 LIMPAR TUDO", primary=False)
         self.btn_clear.clicked.connect(self.clear_list)
+        self.btn_dedupe = AnimatedButton("REMOVER DUPLICADAS", primary=False)
+        self.btn_dedupe.clicked.connect(self.remove_duplicates)
+        self.btn_dedupe.hide()
         btn_layout.addWidget(self.btn_add)
+        btn_layout.addWidget(self.btn_dedupe)
         btn_layout.addWidget(self.btn_clear)
         left_panel.addLayout(btn_layout)
         
@@ -330,20 +776,98 @@ class ImageMergerApp(QWidget):
         self.preview_label.setAlignment(Qt.AlignCenter)
         self.preview_label.setStyleSheet("color: #444444; font-weight: bold; font-size: 12px;")
         self.preview_label.setMinimumWidth(450)
+        # Long failure messages wrap instead of widening the panel
+        self.preview_label.setWordWrap(True)
         preview_inner_layout.addWidget(self.preview_label)
         
         right_panel.addWidget(self.preview_container, 1)
         
-        # Export Section
-        export_group = QFrame()
-        export_group.setFixedHeight(130)
-        export_group.setStyleSheet("background-color: #1e1e1e; border-radius: 10px; border: 1px solid #252525; margin-top: 20px;")
-        export_layout = QVBoxLayout(export_group)
+        # Export Section: an empty frame of the final size for the first paint,
+        # filled in by finish_setup right after it
+        self.export_group = QFrame()
+        self.export_group.setFixedHeight(130)
+        self.export_group.setStyleSheet("background-color: #1e1e1e; border-radius: 10px; border: 1px solid #252525; margin-top: 20px;")
+        right_panel.addWidget(self.export_group)
+        
+        body_layout.addLayout(left_panel, 2)
+        body_layout.addLayout(right_panel, 3)
+        
+        self.content_layout.addWidget(body_widget)
+        
+        # Status Bar
+        self.status_bar = QLabel(" Pronto")
+        self.status_bar.setStyleSheet("color: #666666; font-size: 10px; padding: 5px; background: #181818; border-bottom-left-radius: 12px; border-bottom-right-radius: 12px;")
+        self.content_layout.addWidget(self.status_bar)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.setup_finished:
+            self.setup_finished = True
+            QTimer.singleShot(0, self.finish_setup)
+
+    def finish_setup(self):
+        """Builds what the first frame can do without, once it is on screen.
+
+        The window fades in from transparent, so nothing added here is ever
+        seen popping in.
+        """
+        # The blur is drawn through an offscreen copy of the whole frame, which
+        # more than doubles the cost of a paint
+        shadow = QGraphicsDropShadowEffect(self)
+        shadow.setBlurRadius(30)
+        shadow.setXOffset(0)
+        shadow.setYOffset(0)
+        shadow.setColor(QColor(0, 0, 0, 200))
+        self.main_frame.setGraphicsEffect(shadow)
+        self.build_export_panel()
+        QThreadPool.globalInstance().start(ImportWarmer())
+
+    def build_export_panel(self):
+        # export_engine.DEFAULT_WORKERS, without loading the engine on the GUI thread
+        workers = os.cpu_count() or 1
+        export_layout = QVBoxLayout(self.export_group)
         export_layout.setContentsMargins(20, 15, 20, 15)
         
+        export_header = QHBoxLayout()
         export_title = QLabel("GERAR ARQUIVO FINAL")
         export_title.setStyleSheet("color: #888888; font-size: 10px; font-weight: bold; letter-spacing: 1px;")
-        export_layout.addWidget(export_title)
+        export_header.addWidget(export_title)
+        export_header.addStretch()
+        
+        workers_label = QLabel("NÚCLEOS")
+        workers_label.setStyleSheet("color: #888888; font-size: 10px; font-weight: bold; letter-spacing: 1px; border: none; margin: 0;")
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, workers)
+        self.workers_spin.setValue(workers)
+        self.workers_spin.setStyleSheet("color: #e0e0e0; background: #2d2d2d; border: 1px solid #3d3d3d; border-radius: 4px; margin: 0;")
+        resolution_label = QLabel("RESOLUÇÃO")
+        resolution_label.setStyleSheet("color: #888888; font-size: 10px; font-weight: bold; letter-spacing: 1px; border: none; margin: 0;")
+        self.resolution_combo = QComboBox()
+        for label, fit_args in EXPORT_RESOLUTIONS:
+            self.resolution_combo.addItem(label, fit_args)
+        self.resolution_combo.setStyleSheet("color: #e0e0e0; background: #2d2d2d; border: 1px solid #3d3d3d; border-radius: 4px; margin: 0;")
+        size_label = QLabel("TAMANHO")
+        size_label.setStyleSheet("color: #888888; font-size: 10px; font-weight: bold; letter-spacing: 1px; border: none; margin: 0;")
+        self.size_combo = QComboBox()
+        for label, target_bytes in EXPORT_SIZE_LIMITS:
+            self.size_combo.addItem(label, target_bytes)
+        self.size_combo.setToolTip("Escolhe qualidade e escala para o PDF ou JPG ficar abaixo do tamanho")
+        self.size_combo.setStyleSheet("color: #e0e0e0; background: #2d2d2d; border: 1px solid #3d3d3d; border-radius: 4px; margin: 0;")
+        # Formats written together by the "TODOS" button, from a single decode
+        self.format_checks = {}
+        for fmt in ("jpg", "gif", "pdf"):
+            check = QCheckBox(fmt.upper())
+            check.setChecked(True)
+            check.setStyleSheet("color: #888888; font-size: 10px; font-weight: bold; border: none; margin: 0;")
+            self.format_checks[fmt] = check
+            export_header.addWidget(check)
+        export_header.addWidget(resolution_label)
+        export_header.addWidget(self.resolution_combo)
+        export_header.addWidget(size_label)
+        export_header.addWidget(self.size_combo)
+        export_header.addWidget(workers_label)
+        export_header.addWidget(self.workers_spin)
+        export_layout.addLayout(export_header)
         
         export_btns = QHBoxLayout()
         export_btns.setSpacing(15)
@@ -354,155 +878,352 @@ class ImageMergerApp(QWidget):
         self.btn_jpg.clicked.connect(lambda: self.export_images("jpg"))
         self.btn_gif.clicked.connect(lambda: self.export_images("gif"))
         self.btn_pdf.clicked.connect(lambda: self.export_images("pdf"))
+        self.btn_all = AnimatedButton("TODOS", primary=False)
+        self.btn_all.clicked.connect(self.export_checked_formats)
         
         export_btns.addWidget(self.btn_jpg)
         export_btns.addWidget(self.btn_gif)
         export_btns.addWidget(self.btn_pdf)
-        export_layout.addLayout(export_btns)
-        
-        right_panel.addWidget(export_group)
-        
-        body_layout.addLayout(left_panel, 2)
-        body_layout.addLayout(right_panel, 3)
-        
-        self.content_layout.addWidget(body_widget)
+        export_btns.addWidget(self.btn_all)
         
-        # Status Bar
-        self.status_bar = QLabel(" Pronto")
-        self.status_bar.setStyleSheet("color: #666666; font-size: 10px; padding: 5px; background: #181818; border-bottom-left-radius: 12px; border-bottom-right-radius: 12px;")
-        self.content_layout.addWidget(self.status_bar)
+        self.btn_cancel = AnimatedButton("✕ CANCELAR", primary=False)
+        self.btn_cancel.clicked.connect(self.cancel_export)
+        self.btn_cancel.hide()
+        export_btns.addWidget(self.btn_cancel)
+        export_layout.addLayout(export_btns)
 
     def browse_images(self):
         files, _ = QFileDialog.getOpenFileNames(
-            self, "Selecionar Imagens", "", "Imagens (*.png *.jpg *.jpeg *.bmp *.webp)"
+            self, "Selecionar Imagens", "", "Imagens (*.png *.jpg *.jpeg *.bmp *.webp *.gif *.tif *.tiff)"
         )
         if files:
             self.add_images(files)
 
     def add_images(self, files):
-        for f in files:
-            if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.webp')):
-                item = QListWidgetItem(self.image_list)
-                item.setSizeHint(QSize(0, 95))
-                
-                card = ImageCardWidget(f, self.image_list)
-                card.btn_remove.clicked.connect(lambda checked=False, i=item: self.remove_item(i))
-                # Connect rotation signal to update preview
-                card.rotationChanged.connect(self.update_preview)
-                
-                self.image_list.addItem(item)
-                self.image_list.setItemWidget(item, card)
-                
-                # Motion animation for the card
-                self.animate_card_entry(card)
+        worker = IngestWorker(files)
+        self.ingest_workers.append(worker)
+        self.ingest_pool.start(worker)
+        self.ingest_timer.start()
+
+    def drain_ingest(self):
+        """Moves a batch of scanned files into the queue per UI tick."""
+        # QListView re-lays out every row after an insert, so the batch grows
+        # with the queue to keep the number of relayouts logarithmic.
+        limit = max(INGEST_BATCH, self.queue_model.rowCount() // 10)
+        batch = []
+        while self.ingest_workers and len(batch) < limit:
+            worker = self.ingest_workers[0]
+            try:
+                batch.append(worker.found.get_nowait())
+            except queue.Empty:
+                # Check done before the final empty read, so nothing put in between is lost
+                if not worker.done:
+                    break
+                if worker.found.empty():
+                    self.ingest_workers.pop(0)
         
+        if batch:
+            self.start_dedupe(self.queue_model.add_files(batch))
+        if self.ingest_workers:
+            count = self.queue_model.rowCount()
+            self.count_label.setText(f"{count} itens")
+            self.status_bar.setText(f" Carregando... {count} imagens")
+        else:
+            self.ingest_timer.stop()
+            self.update_count()
+
+    def cancel_ingest(self):
+        for worker in self.ingest_workers:
+            worker.cancel()
+        self.ingest_workers = []
+        self.ingest_timer.stop()
+
+    def start_dedupe(self, entries):
+        if self.dedupe_index is None:
+            from dedupe import DuplicateIndex
+
+            self.dedupe_index = DuplicateIndex()
+        worker = DedupeWorker(entries, self.dedupe_index)
+        self.dedupe_workers.append(worker)
+        self.dedupe_pool.start(worker)
+        self.dedupe_timer.start()
+
+    def drain_dedupe(self):
+        flagged = False
+        for worker in list(self.dedupe_workers):
+            # Read done first, so nothing put before it was set is missed
+            done = worker.done
+            while True:
+                try:
+                    entry, kind, original = worker.found.get_nowait()
+                except queue.Empty:
+                    break
+                entry.duplicate, entry.duplicate_of = kind, original
+                flagged = True
+            if done:
+                self.dedupe_workers.remove(worker)
+        if flagged:
+            self.image_list.viewport().update()
+            self.update_duplicates()
+        if not self.dedupe_workers:
+            self.dedupe_timer.stop()
+
+    def cancel_dedupe(self):
+        for worker in self.dedupe_workers:
+            worker.cancel()
+        self.dedupe_workers = []
+        self.dedupe_timer.stop()
+
+    def update_duplicates(self):
+        # Near duplicates keep their badge but are left for the user to remove one by one
+        count = sum(1 for entry in self.queue_model.entries if entry.duplicate == "exact")
+        self.btn_dedupe.setText(f"REMOVER {count} DUPLICADAS")
+        self.btn_dedupe.setVisible(count > 0)
+
+    def remove_duplicates(self):
+        doomed = {entry for entry in self.queue_model.entries if entry.duplicate == "exact"}
+        if self.dedupe_index is not None:
+            self.dedupe_index.discard(doomed)
+        self.queue_model.remove_entries(doomed)
         self.update_count()
+        self.update_duplicates()
+        self.update_preview()
 
-    def remove_item(self, item):
-        row = self.image_list.row(item)
-        self.image_list.takeItem(row)
+    def remove_item(self, row):
+        if self.dedupe_index is not None:
+            self.dedupe_index.discard([self.queue_model.entries[row]])
+        self.queue_model.remove_row(row)
         self.update_count()
+        self.update_duplicates()
+        self.update_preview()
+
+    def rotate_item(self, row, angle):
+        self.queue_model.rotate_row(row, angle)
         self.update_preview()
 
-    def animate_card_entry(self, card):
-        anim = QPropertyAnimation(card, b"pos")
-        anim.setDuration(400)
-        anim.setStartValue(QPoint(-100, card.pos().y()))
-        anim.setEndValue(card.pos())
-        anim.setEasingCurve(QEasingCurve.OutBack)
-        anim.start()
+    def selected_entry(self):
+        selected = self.image_list.selectionModel().selectedIndexes()
+        return selected[0].data(Qt.UserRole) if selected else None
 
     def update_count(self):
-        count = self.image_list.count()
+        count = self.queue_model.rowCount()
         self.count_label.setText(f"{count} itens")
         self.status_bar.setText(f" {count} imagens carregadas")
 
     def clear_list(self):
-        self.image_list.clear()
+        self.cancel_ingest()
+        self.cancel_dedupe()
+        self.dedupe_index = None
+        self.queue_model.clear()
+        self.update_duplicates()
         self.preview_label.setPixmap(QPixmap())
         self.preview_label.setText("Selecione uma imagem para visualizar")
         self.update_count()
 
     def update_preview(self):
-        selected = self.image_list.selectedItems()
-        if selected:
-            item_widget = self.image_list.itemWidget(selected[0])
-            if item_widget:
-                path = item_widget.file_path
-                rotation = item_widget.rotation
-                pixmap = QPixmap(path)
-                
-                if rotation != 0:
-                    transform = QTransform().rotate(rotation)
-                    pixmap = pixmap.transformed(transform, Qt.SmoothTransformation)
-                
-                scaled_pixmap = pixmap.scaled(
-                    self.preview_label.size() - QSize(40, 40), 
-                    Qt.KeepAspectRatio, 
-                    Qt.SmoothTransformation
-                )
-                self.preview_label.setPixmap(scaled_pixmap)
-                self.preview_label.setText("")
-        else:
+        with session_tracer.stage("update_preview"):
+            self.render_preview()
+
+    def render_preview(self):
+        selected = self.image_list.selectionModel().selectedIndexes()
+        if not selected:
             self.preview_label.setPixmap(QPixmap())
             self.preview_label.setText("Selecione uma imagem para visualizar")
+            return
+        entry = selected[0].data(Qt.UserRole)
+        self.prefetch_previews(selected[0].row())
+
+        image = preview_cache.cached(entry.path)
+        error = preview_cache.failed(entry.path) if image is None else None
+        if error is not None:
+            from large_images import ImageTooLarge
+
+            self.preview_label.setPixmap(QPixmap())
+            if isinstance(error, ImageTooLarge):
+                self.preview_label.setText(f"Não foi possível carregar\n{error}")
+            else:
+                self.preview_label.setText(f"Não foi possível carregar\n{os.path.basename(entry.path)}")
+            return
+        if image is None:
+            # Blurry but instant: the thumbnail stands in until the decode lands
+            image = thumbnail_cache.cached(entry.path)
+        if image is None:
+            self.preview_label.setPixmap(QPixmap())
+            self.preview_label.setText("Carregando...")
+            return
+
+        # Rotation clicks reuse the pixmap of the image already on screen
+        if self.preview_source[0] is not image:
+            self.preview_source = (image, to_qpixmap(image))
+        pixmap = self.preview_source[1]
+        # EXIF orientation is merged with the user's rotation here, on the downscaled image
+        mirror, clockwise = resolve_orientation(entry.rotation, entry.orientation)
+        if mirror or clockwise != 0:
+            transform = QTransform().rotate(clockwise)
+            if mirror:
+                transform = QTransform().scale(-1, 1) * transform
+            pixmap = pixmap.transformed(transform, Qt.SmoothTransformation)
+
+        scaled_pixmap = pixmap.scaled(
+            self.preview_label.size() - QSize(40, 40),
+            Qt.KeepAspectRatio,
+            Qt.SmoothTransformation
+        )
+        self.preview_label.setPixmap(scaled_pixmap)
+        self.preview_label.setText("")
+
+    def prefetch_previews(self, row):
+        """Queues decodes for the selected row first, then its nearest neighbours."""
+        rows = [row] + [r for d in range(1, PREVIEW_PREFETCH + 1) for r in (row + d, row - d)]
+        paths = [self.queue_model.entries[r].path for r in rows if 0 <= r < self.queue_model.rowCount()]
+        self.preview_paths = set(paths)
+        for rank, path in enumerate(paths):
+            if path in self.preview_loaders or preview_cache.cached(path) is not None or preview_cache.failed(path):
+                continue
+            loader = PreviewLoader(path, self.wants_preview)
+            loader.signals.loaded.connect(self.preview_loaded)
+            self.preview_loaders[path] = loader
+            self.preview_pool.start(loader, len(paths) - rank)
+
+    def wants_preview(self, path):
+        # Called from the preview threads; reads the set the GUI thread last assigned
+        return path in self.preview_paths
+
+    def preview_loaded(self, path):
+        self.preview_loaders.pop(path, None)
+        entry = self.selected_entry()
+        if entry and entry.path == path:
+            self.update_preview()
 
     def export_images(self, fmt):
-        count = self.image_list.count()
-        if count == 0:
+        self.start_export([fmt])
+
+    def export_checked_formats(self):
+        formats = [fmt for fmt, check in self.format_checks.items() if check.isChecked()]
+        if not formats:
+            self.status_bar.setText(" Erro: Nenhum formato marcado")
+            return
+        self.start_export(formats)
+
+    def start_export(self, formats):
+        if self.queue_model.rowCount() == 0:
             self.status_bar.setText(" Erro: Nenhuma imagem na fila")
             return
+        target_bytes = self.size_combo.currentData()
+        if target_bytes and formats not in (["pdf"], ["jpg"]):
+            self.status_bar.setText(" Erro: O limite de tamanho vale só para PDF ou JPG exportados sozinhos")
+            return
+        from export_engine import PageFit, PageSpec
         
-        image_data = []
-        for i in range(count):
-            item = self.image_list.item(i)
-            widget = self.image_list.itemWidget(item)
-            image_data.append((widget.file_path, widget.rotation))
+        image_data = [
+            PageSpec(entry.path, entry.rotation, entry.orientation) for entry in self.queue_model.entries
+        ]
+        label = " + ".join(fmt.upper() for fmt in formats)
             
-        processed_images = []
-        for path, rotation in image_data:
-            img = Image.open(path).convert("RGB")
-            if rotation != 0:
-                # PIL rotates counter-clockwise, so we use -rotation
-                img = img.rotate(-rotation, expand=True)
-            processed_images.append(img)
-        
-        save_path, _ = QFileDialog.getSaveFileName(
-            self, "Salvar Arquivo", f"resultado.{fmt}", f"Arquivo {fmt.upper()} (*.{fmt})"
-        )
+        if len(formats) == 1:
+            fmt = formats[0]
+            save_path, _ = QFileDialog.getSaveFileName(
+                self, "Salvar Arquivo", f"resultado.{fmt}", f"Arquivo {fmt.upper()} (*.{fmt})"
+            )
+        else:
+            # One name for all of them; each format gets its own extension
+            save_path, _ = QFileDialog.getSaveFileName(
+                self, "Salvar Arquivos", "resultado", f"Nome base para {label} (*)"
+            )
         
         if not save_path:
             return
+        if len(formats) > 1:
+            stem = os.path.splitext(save_path)[0]
+            save_path = {fmt: f"{stem}.{fmt}" for fmt in formats}
             
-        self.status_bar.setText(f" Processando {fmt.upper()}...")
-        QApplication.processEvents()
+        self.status_bar.setText(f" Processando {label}...")
         
-        try:
-            if fmt == "jpg":
-                widths, heights = zip(*(i.size for i in processed_images))
-                max_width = max(widths)
-                total_height = sum(heights)
-                new_im = Image.new('RGB', (max_width, total_height), (255, 255, 255))
-                y_offset = 0
-                for im in processed_images:
-                    new_im.paste(im, (0, y_offset))
-                    y_offset += im.size[1]
-                new_im.save(save_path, "JPEG", quality=90)
-                
-            elif fmt == "gif":
-                processed_images[0].save(
-                    save_path, save_all=True, append_images=processed_images[1:], 
-                    duration=500, loop=0, optimize=True
-                )
-                
-            elif fmt == "pdf":
-                processed_images[0].save(
-                    save_path, save_all=True, append_images=processed_images[1:]
-                )
-                
-            self.status_bar.setText(f" Sucesso! Salvo em: {os.path.basename(save_path)}")
-        except Exception as e:
-            self.status_bar.setText(f" Erro ao salvar: {str(e)}")
+        # The worker gets its own copy of the queue, so the list can be
+        # reordered for the next batch while this one is being written.
+        fit_args = self.resolution_combo.currentData()
+        options = {"fit": PageFit(**fit_args) if fit_args else None}
+        if formats == ["pdf"]:
+            options["page_cache"] = shared_page_cache()
+        if target_bytes:
+            options["target_bytes"] = target_bytes
+        self.export_worker = ExportWorker(formats[0], image_data, save_path, self.workers_spin.value(), options)
+        self.export_worker.signals.progress.connect(
+            lambda done, total: self.show_export_progress(label, done, total)
+        )
+        self.export_worker.signals.finished.connect(lambda stats: self.export_finished(save_path, stats))
+        self.export_worker.signals.failed.connect(self.export_failed)
+        self.export_worker.signals.cancelled.connect(self.export_cancelled)
+        self.set_exporting(True)
+        QThreadPool.globalInstance().start(self.export_worker)
+
+    def show_export_progress(self, label, done, total):
+        if not self.export_worker:
+            return
+        pages_per_sec, mb_per_sec = self.export_worker.tracer.throughput()
+        self.status_bar.setText(
+            f" Processando {label}... página {done}/{total} "
+            f"({pages_per_sec:.1f} páginas/s, {mb_per_sec:.1f} MB/s)"
+        )
+
+    def cancel_export(self):
+        if self.export_worker:
+            self.export_worker.cancel()
+            self.status_bar.setText(" Cancelando...")
+
+    def set_exporting(self, exporting):
+        for btn in [self.btn_jpg, self.btn_gif, self.btn_pdf, self.btn_all]:
+            btn.setEnabled(not exporting)
+        self.btn_cancel.setVisible(exporting)
+        if not exporting:
+            if TRACE_PATH:
+                session_tracer.merge(self.export_worker.tracer.events)
+            self.export_worker = None
+
+    def closeEvent(self, event):
+        # Let a running export stop and remove its partial file before quitting
+        self.cancel_ingest()
+        self.cancel_export()
+        self.cancel_dedupe()
+        self.dedupe_pool.waitForDone()
+        self.preview_paths = set()
+        self.preview_pool.waitForDone()
+        QThreadPool.globalInstance().waitForDone()
+        if TRACE_PATH:
+            session_tracer.dump(TRACE_PATH)
+        super().closeEvent(event)
+
+    def export_finished(self, save_path, stats):
+        self.set_exporting(False)
+        if isinstance(stats, dict):
+            names = ", ".join(os.path.basename(path) for path in save_path.values())
+            stats = next(iter(stats.values()))  # pages, time and memory are shared
+            self.status_bar.setText(
+                f" Sucesso! Salvos: {names} "
+                f"({stats.pages} páginas em {stats.elapsed:.1f} s, pico de memória {stats.peak_rss_mb:.0f} MB)"
+            )
+            return
+        saved = os.path.basename(save_path)
+        if stats.outputs:
+            saved = f"{len(stats.outputs)} partes, {os.path.basename(stats.outputs[0])}…"
+        if stats.cached_pages:
+            saved += f", {stats.cached_pages} páginas reaproveitadas"
+        if stats.budget:
+            budget = stats.budget
+            setting = "originais" if budget.quality is None else f"qualidade {budget.quality}, escala {budget.scale:.0%}"
+            saved += f", {stats.bytes_written / 1e6:.1f} de {budget.target / 1e6:.0f} MB ({setting})"
+        self.status_bar.setText(
+            f" Sucesso! Salvo em: {saved} "
+            f"({stats.pages} páginas em {stats.elapsed:.1f} s, pico de memória {stats.peak_rss_mb:.0f} MB)"
+        )
+
+    def export_failed(self, message):
+        self.set_exporting(False)
+        self.status_bar.setText(f" Erro ao salvar: {message}")
+
+    def export_cancelled(self):
+        self.set_exporting(False)
+        self.status_bar.setText(" Exportação cancelada")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
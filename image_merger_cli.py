@@ -0,0 +1,257 @@
+"""Headless front-end for the Image Merger export pipeline.
+
+Merges images into a stitched JPG, an animated GIF or a multi-page PDF
+without Qt, so it can run from cron on servers:
+
+    python3 image_merger_cli.py scans/ -f pdf -o scans.pdf
+    python3 image_merger_cli.py 'photos/*.jpg' -f jpg -o strip.jpg --rotate photos/a.jpg=90
+    python3 image_merger_cli.py fotos/ -f pdf -o fotos.pdf --page-size a4 --dpi 150
+    python3 image_merger_cli.py scans/ -f pdf,gif,jpg -o scans
+    python3 image_merger_cli.py slides/ -f gif -o slides.gif --gif-duration 800 --gif-size 640x480
+    python3 image_merger_cli.py scans/ -f pdf -o scans.pdf --target-size 10M
+    python3 image_merger_cli.py --batch archive/* -f pdf --output-dir out/ --jobs 4 --summary run.json
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from export_engine import DEFAULT_WORKERS, EXPORTERS, GIF_FRAME_DURATION, PAGE_SIZES, PageFit, PageSpec, export
+from ingest import scan_paths
+from large_images import MAX_PIXELS, set_max_pixels
+from multi_export import export_many
+from tracing import Tracer
+
+EXIT_OK = 0
+EXIT_FAILED = 1  # at least one job raised an error
+EXIT_NO_INPUT = 3  # no job had any image to export
+
+
+def expand_inputs(patterns):
+    """Expands shell-style globs; directories are walked later by scan_paths."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        paths.extend(matches if matches else [pattern])
+    return paths
+
+
+def parse_rotations(values):
+    rotations = {}
+    for value in values:
+        path, sep, degrees = value.rpartition("=")
+        if not sep or not degrees.lstrip("-").isdigit() or int(degrees) % 90:
+            raise argparse.ArgumentTypeError(f"rotação inválida: {value!r} (use ARQUIVO=90)")
+        rotations[os.path.abspath(path)] = int(degrees) % 360
+    return rotations
+
+
+def parse_formats(value):
+    """Accepts one format or several separated by commas, e.g. ``pdf,gif``."""
+    formats = list(dict.fromkeys(f.strip().lower() for f in value.split(",") if f.strip()))
+    if not formats or any(f not in EXPORTERS for f in formats):
+        raise argparse.ArgumentTypeError(f"formato inválido: {value!r} (use {', '.join(sorted(EXPORTERS))})")
+    return ",".join(formats)
+
+
+def format_outputs(output, formats):
+    """One output per format, named after ``output`` with the format's extension."""
+    stem = os.path.splitext(output)[0]
+    return {fmt: f"{stem}.{fmt}" for fmt in formats}
+
+
+def parse_size(value):
+    width, sep, height = value.lower().partition("x")
+    if not sep or not width.isdigit() or not height.isdigit() or not int(width) or not int(height):
+        raise argparse.ArgumentTypeError(f"tamanho inválido: {value!r} (use LARGURAxALTURA)")
+    return int(width), int(height)
+
+
+# Decimal units, as upload portals count them; also under the binary ones
+SIZE_UNITS = {"": 1, "K": 1000, "M": 1000 ** 2, "G": 1000 ** 3}
+
+
+def parse_bytes(value):
+    """Accepts a byte count with an optional K, M or G suffix, e.g. ``10M`` or ``500KB``."""
+    text = value.strip().upper().removesuffix("B")
+    number, unit = (text[:-1], text[-1]) if text[-1:] in SIZE_UNITS else (text, "")
+    try:
+        size = float(number) * SIZE_UNITS[unit]
+    except ValueError:
+        size = 0
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"tamanho inválido: {value!r} (use por exemplo 10M ou 500K)")
+    return int(size)
+
+
+def exporter_options(args):
+    """Collects the exporter options given on the command line."""
+    options = {}
+    if args.page_size or args.dpi or args.max_dimension:
+        options["fit"] = PageFit(args.page_size, args.dpi, args.max_dimension)
+    if args.target_size:
+        options["target_bytes"] = args.target_size
+    if "gif" in args.format.split(","):
+        options["duration"] = args.gif_duration
+        if args.gif_size:
+            options["frame_size"] = args.gif_size
+    return options
+
+
+def run_job(inputs, fmt, output, rotations=None, workers=1, trace=False, options=None):
+    """Exports one set of inputs and returns a JSON-serialisable summary.
+
+    Several comma-separated formats are written from a single decode, each
+    next to ``output`` with its own extension. With ``trace`` the stage
+    timings are added to the summary and a Chrome trace is written next to
+    the output as ``<output>.trace.json``.
+    """
+    rotations = rotations or {}
+    pages = [
+        PageSpec(path, rotations.get(os.path.abspath(path), 0), orientation)
+        for path, _size, _kind, orientation in scan_paths(inputs)
+    ]
+    summary = {"inputs": inputs, "output": output, "format": fmt, "pages": len(pages)}
+    if not pages:
+        summary["status"] = "empty"
+        return summary
+    tracer = Tracer() if trace else None
+    formats = fmt.split(",")
+    try:
+        if len(formats) == 1:
+            results = {fmt: export(fmt, pages, output, workers=workers, tracer=tracer, **(options or {}))}
+        else:
+            outputs = format_outputs(output, formats)
+            results = export_many(outputs, pages, workers=workers, tracer=tracer, **(options or {}))
+    except Exception as e:
+        summary.update(status="error", error=str(e))
+        return summary
+    per_format = {}
+    for name, stats in results.items():
+        per_format[name] = {
+            "bytes_written": stats.bytes_written,
+            "elapsed": round(stats.elapsed, 3),
+            "passthrough_pages": stats.passthrough_pages,
+            "peak_rss_mb": round(stats.peak_rss_mb, 1),
+        }
+        if stats.outputs:
+            per_format[name]["outputs"] = stats.outputs
+        if stats.budget:
+            per_format[name]["budget"] = {
+                "target_bytes": stats.budget.target,
+                "quality": stats.budget.quality,
+                "scale": stats.budget.scale,
+                "estimated_bytes": stats.budget.estimate,
+                "passes": stats.budget.passes,
+                "sample_encodes": stats.budget.sample_encodes,
+            }
+    summary["status"] = "ok"
+    if len(formats) == 1:
+        summary.update(per_format[fmt])
+    else:
+        summary["outputs"] = outputs
+        summary["formats"] = per_format
+    if tracer:
+        summary["stages"] = tracer.summary()["stages"]
+        summary["trace"] = output + ".trace.json"
+        tracer.dump(summary["trace"])
+    return summary
+
+
+def build_jobs(args, rotations):
+    inputs = expand_inputs(args.inputs)
+    options = exporter_options(args)
+    if not args.batch:
+        output = args.output or f"resultado.{args.format.split(',')[0]}"
+        return [(inputs, args.format, output, rotations, args.workers, args.trace, options)]
+
+    # One job per input; its output is named after it
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs = []
+    for path in inputs:
+        name = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+        output = os.path.join(args.output_dir, f"{name}.{args.format.split(',')[0]}")
+        jobs.append(([path], args.format, output, rotations, args.workers, args.trace, options))
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Junta imagens em um JPG, GIF ou PDF sem interface gráfica."
+    )
+    parser.add_argument("inputs", nargs="+", help="arquivos, globs ou diretórios")
+    parser.add_argument("-f", "--format", type=parse_formats, default="pdf",
+                        help="jpg, gif ou pdf; vários separados por vírgula saem de uma só decodificação")
+    parser.add_argument("-o", "--output", help="arquivo de saída (modo simples)")
+    parser.add_argument(
+        "--rotate", action="append", default=[], metavar="ARQUIVO=GRAUS",
+        help="rotação horária de um arquivo, pode ser repetido"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="processos por exportação")
+    parser.add_argument("--batch", action="store_true", help="uma exportação por entrada")
+    parser.add_argument("--output-dir", default=".", help="diretório de saída no modo batch")
+    parser.add_argument("--jobs", type=int, default=1, help="exportações simultâneas no modo batch")
+    parser.add_argument("--summary", help="grava o resumo JSON neste arquivo em vez da saída padrão")
+    parser.add_argument("--trace", action="store_true",
+                        help="mede cada etapa e grava um Chrome trace ao lado de cada saída")
+    parser.add_argument("--page-size", choices=sorted(PAGE_SIZES),
+                        help="reduz as páginas para caber neste papel (com --dpi)")
+    parser.add_argument("--dpi", type=int, help="resolução das páginas no papel (padrão: 150)")
+    parser.add_argument("--max-dimension", type=int, metavar="PX",
+                        help="reduz as páginas para no máximo PX pixels no lado maior")
+    parser.add_argument("--gif-duration", type=int, default=GIF_FRAME_DURATION, metavar="MS",
+                        help="duração de cada quadro do GIF em milissegundos")
+    parser.add_argument("--gif-size", type=parse_size, metavar="LARGURAxALTURA",
+                        help="tamanho dos quadros do GIF (padrão: o da primeira imagem)")
+    parser.add_argument("--max-pixels", type=int, default=MAX_PIXELS, metavar="N",
+                        help="maior imagem decodificada inteira, em pixels; as maiores só são lidas "
+                             f"reduzidas ou em faixas (padrão: {MAX_PIXELS})")
+    parser.add_argument("--target-size", type=parse_bytes, metavar="BYTES",
+                        help="escolhe qualidade JPEG e escala para o PDF ou JPG ficar abaixo deste "
+                             "tamanho, ex.: 10M")
+    args = parser.parse_args(argv)
+    # Also reaches the worker processes, through the environment
+    set_max_pixels(args.max_pixels)
+
+    try:
+        rotations = parse_rotations(args.rotate)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    if args.target_size and args.format not in ("pdf", "jpg"):
+        parser.error("--target-size vale para um único formato, pdf ou jpg")
+    if args.workers is None:
+        # Parallel jobs already use the cores; don't multiply processes
+        args.workers = 1 if args.batch and args.jobs > 1 else DEFAULT_WORKERS
+
+    jobs = build_jobs(args, rotations)
+    if args.batch and args.jobs > 1:
+        with ProcessPoolExecutor(args.jobs, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(run_job, *zip(*jobs)))
+    else:
+        results = [run_job(*job) for job in jobs]
+
+    summary = {
+        "jobs": results,
+        "ok": sum(r["status"] == "ok" for r in results),
+        "failed": sum(r["status"] == "error" for r in results),
+        "empty": sum(r["status"] == "empty" for r in results),
+    }
+    text = json.dumps(summary, indent=2, ensure_ascii=False)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as fp:
+            fp.write(text + "\n")
+    else:
+        print(text)
+
+    if summary["failed"]:
+        return EXIT_FAILED
+    if not summary["ok"]:
+        return EXIT_NO_INPUT
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
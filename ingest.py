@@ -0,0 +1,94 @@
+import os
+
+from PIL import Image
+
+ORIENTATION_TAG = 0x0112
+# Formats that can carry an EXIF Orientation tag
+EXIF_KINDS = {"jpeg", "tiff", "webp"}
+
+# Leading bytes of the formats the exporters can read
+SIGNATURES = [
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+]
+
+
+def sniff_image_type(path):
+    """Returns the image format of ``path`` from its magic bytes, or None."""
+    try:
+        with open(path, "rb") as fp:
+            head = fp.read(16)
+    except OSError:
+        return None
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for magic, kind in SIGNATURES:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def read_orientation(path):
+    """Returns the EXIF Orientation (1-8) of ``path``, 1 if it has none.
+
+    Only the header is parsed; the pixels are never decoded.
+    """
+    try:
+        with Image.open(path) as img:
+            orientation = img.getexif().get(ORIENTATION_TAG, 1)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        # The bomb check is Pillow's own, unless large_images has replaced it
+        return 1
+    return orientation if orientation in range(1, 9) else 1
+
+
+def _walk(directory):
+    """Yields ``(path, size)`` for every file below ``directory``, in name order."""
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file():
+                    yield entry.path, entry.stat().st_size
+            except OSError:
+                continue
+        # Reversed so the stack pops them in name order
+        stack.extend(reversed(subdirs))
+
+
+def scan_paths(paths, cancelled=None):
+    """Expands files and directories into ``(path, size, kind, orientation)`` for every image.
+
+    Directories are walked recursively; anything whose magic bytes are not a
+    known image format is skipped, whatever its extension. The EXIF
+    orientation is read here, once, so later stages never reopen the header.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = _walk(path)
+        else:
+            try:
+                candidates = [(path, os.path.getsize(path))]
+            except OSError:
+                continue
+        for file_path, size in candidates:
+            if cancelled and cancelled():
+                return
+            kind = sniff_image_type(file_path)
+            if kind:
+                orientation = read_orientation(file_path) if kind in EXIF_KINDS else 1
+                yield file_path, size, kind, orientation
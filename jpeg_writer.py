@@ -0,0 +1,75 @@
+import io
+import struct
+
+MCU_SIZE = 16  # pixels per MCU side with 4:2:0 chroma subsampling
+MAX_JPEG_SIDE = 65500  # libjpeg's JPEG_MAX_DIMENSION, a little under the 16-bit header field
+STRIP_HEIGHT = 256
+
+
+def _split_jpeg(data):
+    """Splits a baseline JPEG into (segments before SOS, SOS segment, entropy-coded data)."""
+    pos = 2  # after SOI
+    while True:
+        marker, length = data[pos + 1], struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        end = pos + 2 + length
+        if marker == 0xDA:
+            return data[2:pos], data[pos:end], data[end:-2]
+        pos = end
+
+
+def _set_height(segments, height):
+    """Patches the image height in the SOF0 segment."""
+    segments = bytearray(segments)
+    pos = 0
+    while segments[pos + 1] != 0xC0:
+        pos += 2 + struct.unpack(">H", segments[pos + 2:pos + 4])[0]
+    segments[pos + 5:pos + 7] = struct.pack(">H", height)
+    return bytes(segments)
+
+
+class JpegStripWriter:
+    """Writes one baseline JPEG out of horizontal strips that are encoded separately.
+
+    Every strip is a whole number of MCU rows and is compressed on its own with
+    the same tables; the strips are then joined as restart intervals, which
+    start from a clean entropy coder state just like a new image does. Only
+    one strip is ever held in memory.
+    """
+
+    def __init__(self, fp, width, height, quality=90, strip_height=STRIP_HEIGHT):
+        if width > MAX_JPEG_SIDE or height > MAX_JPEG_SIDE:
+            raise ValueError(f"JPEG limitado a {MAX_JPEG_SIDE} pixels por lado ({width}x{height})")
+        self.fp = fp
+        self.width = width
+        self.height = height
+        self.quality = quality
+        mcus_per_row = -(-width // MCU_SIZE)
+        # The restart interval, one strip's worth of MCUs, is a 16-bit field
+        mcu_rows = max(1, min(strip_height // MCU_SIZE, 0xFFFF // mcus_per_row))
+        self.strip_height = mcu_rows * MCU_SIZE
+        self.restart_interval = mcus_per_row * mcu_rows
+        self.rows = 0
+        self.strips = 0
+        self.pos = 0
+
+    def _write(self, data):
+        self.fp.write(data)
+        self.pos += len(data)
+
+    def add_strip(self, img):
+        """Appends the next ``strip_height`` rows; only the last strip may be shorter."""
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=self.quality, subsampling=2, optimize=False)
+        segments, sos, scan = _split_jpeg(buf.getvalue())
+        if self.strips == 0:
+            dri = b"\xff\xdd" + struct.pack(">HH", 4, self.restart_interval)
+            self._write(b"\xff\xd8" + _set_height(segments, self.height) + dri + sos)
+        else:
+            self._write(bytes([0xFF, 0xD0 + (self.strips - 1) % 8]))
+        self._write(scan)
+        self.strips += 1
+        self.rows += img.height
+
+    def close(self):
+        self._write(b"\xff\xd9")
+        self.fp.flush()
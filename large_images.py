@@ -0,0 +1,237 @@
+"""Bounded-memory handling of very large images, such as map scans.
+
+Pixel counts always come from the headers. Thumbnails, previews and scaled
+exports are decoded at reduced scale: from the EXIF thumbnail when it is big
+enough, from the smallest sufficient level of a pyramidal TIFF, through
+libjpeg's DCT scaling, or, for pixels stored as plain rows (uncompressed
+TIFF, BMP, PPM), by shrinking one band of rows at a time. Full-resolution
+pages with plain rows are read in bands as well. Anything that still has to
+be decoded whole is checked against MAX_PIXELS first, so an oversized file
+fails on its own with a clear message instead of exhausting memory.
+"""
+import io
+import os
+
+from PIL import ExifTags, Image
+
+# Pixels a single whole decode may allocate; IMAGE_MERGER_MAX_PIXELS overrides it
+MAX_PIXELS = int(os.environ.get("IMAGE_MERGER_MAX_PIXELS") or 250_000_000)
+LARGE_PIXELS = 64_000_000  # from here on, plain-row pages are read in bands
+BAND_BYTES = 32 * 1024 * 1024  # raw bytes read per band
+BANDED_MODES = ("L", "RGB", "RGBA")
+REDUCED_RESOLUTION = 1  # NewSubfileType bit of the lower levels of a TIFF pyramid
+
+# Replaced by MAX_PIXELS, which is checked against what is really decoded:
+# Pillow's check looks at the header size and would also reject huge JPEGs
+# that are only ever read at 1/8 scale or copied into a PDF as they are.
+Image.MAX_IMAGE_PIXELS = None
+
+
+class ImageTooLarge(OSError):
+    """A whole decode of the image would go over MAX_PIXELS."""
+
+    def __init__(self, path, size):
+        width, height = size
+        super().__init__(
+            f"{os.path.basename(path)}: {width}x{height} ({width * height / 1e6:.0f} MP) passa do limite "
+            f"de {MAX_PIXELS / 1e6:.0f} MP para decodificar a imagem inteira"
+        )
+        self.path = path
+        self.size = size
+
+    def __reduce__(self):
+        # Raised in the export worker processes: it must come back through pickle
+        return type(self), (self.path, self.size)
+
+
+def set_max_pixels(limit):
+    """Changes MAX_PIXELS here and in the export worker processes started afterwards."""
+    global MAX_PIXELS
+    MAX_PIXELS = int(limit)
+    os.environ["IMAGE_MERGER_MAX_PIXELS"] = str(MAX_PIXELS)
+
+
+def _covers(size, target):
+    return size[0] >= target[0] and size[1] >= target[1]
+
+
+def _same_aspect(size, other):
+    return abs(size[0] * other[1] - size[1] * other[0]) <= 0.01 * size[0] * other[1]
+
+
+def embedded_thumbnail(img, target):
+    """The JPEG's EXIF thumbnail, if it covers ``target`` and shows the whole image; else None."""
+    exif_data = img.info.get("exif") if img.format == "JPEG" else None
+    if not exif_data:
+        return None
+    try:
+        ifd1 = img.getexif().get_ifd(ExifTags.IFD.IFD1)
+        start, length = ifd1[0x0201], ifd1[0x0202]
+        # Offsets count from the TIFF header, after the "Exif\0\0" prefix
+        thumb = Image.open(io.BytesIO(exif_data[6 + start:6 + start + length]))
+        thumb.load()
+    except (KeyError, OSError, SyntaxError, ValueError):
+        return None
+    # Cameras often pad the thumbnail with black bars to 4:3
+    if not _covers(thumb.size, target) or not _same_aspect(thumb.size, img.size):
+        return None
+    return thumb
+
+
+def pick_level(img, target):
+    """Seeks a pyramidal TIFF to its smallest reduced-resolution level that still covers ``target``."""
+    if img.format != "TIFF" or getattr(img, "n_frames", 1) < 2:
+        return
+    full = img.size
+    best = 0
+    for frame in range(1, img.n_frames):
+        img.seek(frame)
+        reduced = img.tag_v2.get(254, 0) & REDUCED_RESOLUTION
+        if reduced and _covers(img.size, target) and _same_aspect(img.size, full):
+            best = frame
+    img.seek(best)
+
+
+def row_layout(img):
+    """``(offset, stride, orientation, rawmode)`` if the pixels are stored as plain rows, else None."""
+    if img.mode not in BANDED_MODES or len(img.tile) != 1:
+        return None
+    tile = img.tile[0]
+    if tile.codec_name != "raw" or tuple(tile.extents) != (0, 0, *img.size):
+        return None
+    args = tile.args if isinstance(tile.args, tuple) else (tile.args,)
+    rawmode, stride, orientation = (args + (0, 1))[:3]
+    try:
+        row_bytes = len(Image.new(img.mode, (img.width, 1)).tobytes("raw", rawmode))
+    except (ValueError, OSError):
+        return None
+    return tile.offset, stride or row_bytes, orientation, rawmode
+
+
+def read_rows(path, mode, size, layout, top, bottom):
+    """Decodes rows ``top`` to ``bottom`` of an image with plain rows."""
+    offset, stride, orientation, rawmode = layout
+    width, height = size
+    # Bottom-up files (BMP) store the last row first
+    first = top if orientation > 0 else height - bottom
+    with open(path, "rb") as fp:
+        fp.seek(offset + first * stride)
+        data = fp.read((bottom - top) * stride)
+    return Image.frombytes(mode, (width, bottom - top), data, "raw", rawmode, stride, orientation)
+
+
+def band_rows(width, mode, multiple=1):
+    """Rows per band, a multiple of ``multiple``, holding about BAND_BYTES."""
+    rows = max(1, BAND_BYTES // (width * len(mode)))
+    return max(multiple, rows - rows % multiple)
+
+
+def reduce_in_bands(img, layout, factor):
+    """Shrinks an image with plain rows by ``factor``, holding one band of rows at a time."""
+    path = img.filename
+    out = Image.new(img.mode, (-(-img.width // factor), -(-img.height // factor)))
+    rows = band_rows(img.width, img.mode, factor)
+    for top in range(0, img.height, rows):
+        band = read_rows(path, img.mode, img.size, layout, top, min(top + rows, img.height))
+        out.paste(band.reduce(factor), (0, top // factor))
+    return out
+
+
+def check_pixels(img):
+    if img.width * img.height > MAX_PIXELS:
+        raise ImageTooLarge(img.filename, img.size)
+
+
+def decode_at(img, target, embedded=False):
+    """Loads the opened ``img`` at the smallest scale that still covers ``target``.
+
+    The result may be larger than ``target`` and is left to the caller to
+    resize. With ``embedded``, a large JPEG's EXIF thumbnail is used as is
+    when it is big enough.
+    Raises ImageTooLarge if the only way is a whole decode over MAX_PIXELS.
+    """
+    if _covers(target, img.size):
+        check_pixels(img)
+        img.load()
+        return img
+    # Only for large images: editors don't always refresh the EXIF thumbnail
+    if embedded and img.width * img.height > LARGE_PIXELS:
+        thumb = embedded_thumbnail(img, target)
+        if thumb is not None:
+            return thumb
+    pick_level(img, target)
+    # JPEGs are scaled by 1/2, 1/4 or 1/8 inside libjpeg, never below target
+    img.draft(img.mode, target)
+    factor = min(img.width // target[0], img.height // target[1])
+    if factor > 1 and img.width * img.height > LARGE_PIXELS:
+        layout = row_layout(img)
+        if layout is not None:
+            return reduce_in_bands(img, layout, factor)
+    check_pixels(img)
+    img.load()
+    return img
+
+
+class BandedImage:
+    """A full-resolution page read from its file one band of rows at a time.
+
+    Stands in for a decoded image where only ``size``, ``crop`` and
+    ``close`` are used, as by the stitcher and the strip JPEG encoder.
+    Holds no file handle or pixels, so it pickles into a few bytes.
+    """
+
+    def __init__(self, path, mode, size, layout):
+        self.path = path
+        self.mode = mode
+        self.size = size
+        self.layout = layout
+
+    @classmethod
+    def open(cls, img):
+        """A BandedImage for a large opened image with plain rows, else None."""
+        if img.width * img.height <= LARGE_PIXELS:
+            return None
+        layout = row_layout(img)
+        return cls(img.filename, img.mode, img.size, layout) if layout else None
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    def crop(self, box):
+        left, top, right, bottom = box
+        rows = read_rows(self.path, self.mode, self.size, self.layout, top, bottom)
+        if (left, right) != (0, self.width):
+            rows = rows.crop((left, 0, right, bottom - top))
+        return rows.convert("RGB")
+
+    def load(self):
+        """Decodes the whole page, within MAX_PIXELS."""
+        if self.width * self.height > MAX_PIXELS:
+            raise ImageTooLarge(self.path, self.size)
+        return self.crop((0, 0, self.width, self.height))
+
+    def close(self):
+        pass
+
+
+def classify(path):
+    """Returns ``(kind, megapixels)`` from the header; kind is "large", "too_large" or None.
+
+    "large" images are read at reduced scale or in bands; "too_large" ones
+    would need a whole decode over MAX_PIXELS for anything at full size.
+    """
+    try:
+        with Image.open(path) as img:
+            pixels = img.width * img.height
+            if pixels <= LARGE_PIXELS:
+                return None, pixels / 1e6
+            if pixels > MAX_PIXELS and row_layout(img) is None:
+                return "too_large", pixels / 1e6
+            return "large", pixels / 1e6
+    except (OSError, SyntaxError, ValueError):
+        return None, 0
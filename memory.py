@@ -0,0 +1,41 @@
+"""Peak resident memory of a piece of work, for export stats and benchmarks.
+
+getrusage's ru_maxrss is a poor fit for both: it covers a process's whole
+life, is inherited across fork and exec, and leaves out the pool workers.
+On Linux the kernel's high-water mark, VmHWM, can instead be reset through
+/proc/<pid>/clear_refs and read for any process of ours. No dependencies,
+so the startup benchmark can use it without loading anything.
+"""
+import os
+import resource
+
+
+def reset_peak(pids=None):
+    """Starts a new high-water mark for each process in ``pids``, by default this one."""
+    for pid in pids or [os.getpid()]:
+        try:
+            with open(f"/proc/{pid}/clear_refs", "w") as fp:
+                fp.write("5")
+        except OSError:
+            pass  # gone, or no /proc: peak_rss_mb falls back to getrusage
+
+
+def peak_rss_mb(pids=None):
+    """Sum of the peak resident memory of ``pids`` since their last reset, in MB.
+
+    Without /proc, this process's lifetime peak from getrusage.
+    """
+    total_kb = None
+    for pid in pids or [os.getpid()]:
+        try:
+            with open(f"/proc/{pid}/status") as fp:
+                for line in fp:
+                    if line.startswith("VmHWM:"):
+                        total_kb = (total_kb or 0) + int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    if total_kb is None:
+        # ru_maxrss is reported in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return total_kb / 1024
@@ -0,0 +1,195 @@
+"""Exports one queue to several formats from a single decode.
+
+Every page is decoded and rotated once; the same image is handed to one
+encoder thread per format through small bounded queues, so the encoders run
+side by side and the job takes about as long as the slowest of them.
+"""
+import os
+import queue
+import threading
+import time
+
+from export_engine import (
+    GIF_FRAME_DURATION, ExportStats, PageSpec, StitchWriter, encode_jpeg, gif_frame_size, iter_pages,
+    peak_rss_mb, read_jpeg_passthrough, reset_peak_rss, resolve_orientation,
+)
+from gif_encoder import GifWriter, build_palette, quantize_frame
+from large_images import BandedImage
+from pdf_writer import PdfWriter
+from tracing import NULL_TRACER
+
+SINK_QUEUE_DEPTH = 2  # pages waiting for each encoder
+_DONE = object()
+_ABORT = object()
+
+
+class PdfSink:
+    """PDF encoder fed with decoded pages; JPEGs are still copied as they are where possible."""
+
+    def __init__(self, save_path, pages, fit=None, tracer=NULL_TRACER):
+        self.save_path = save_path
+        self.pages = pages
+        self.fit = fit
+        self.tracer = tracer
+        self.dpi = fit.print_dpi() if fit else 72
+        self.passthrough_pages = 0
+        self.fp = open(save_path, "wb")
+        self.writer = PdfWriter(self.fp)
+        self.paths = [save_path]
+
+    def add(self, index, img):
+        spec = self.pages[index]
+        mirror, clockwise = resolve_orientation(spec.rotation, spec.orientation)
+        page = None if mirror else read_jpeg_passthrough(spec.path, self.fit)
+        if page is None:
+            # The shared image is already turned, so there is nothing left for /Rotate
+            with self.tracer.stage("encode", page=index, format="pdf"):
+                page = encode_jpeg(img)
+            clockwise = 0
+        page_size = self.fit.page_points(page.width, page.height) if self.fit else None
+        with self.tracer.stage("write", page=index, format="pdf"):
+            self.writer.add_jpeg_page(
+                page.data, page.width, page.height, page.mode, clockwise, self.dpi, page_size
+            )
+        self.passthrough_pages += page.passthrough
+
+    @property
+    def bytes_written(self):
+        return self.writer.pos
+
+    def close(self):
+        self.writer.close()
+        self.fp.close()
+
+    def abort(self):
+        self.fp.close()
+        if os.path.exists(self.save_path):
+            os.remove(self.save_path)
+
+
+class GifSink:
+    """GIF encoder fed with decoded pages, quantized here rather than in the workers."""
+
+    def __init__(self, save_path, pages, fit=None, tracer=NULL_TRACER, duration=GIF_FRAME_DURATION,
+                 frame_size=None):
+        self.save_path = save_path
+        self.tracer = tracer
+        self.duration = duration
+        self.size = tuple(frame_size or gif_frame_size(pages, fit))
+        with tracer.stage("palette"):
+            self.palette = build_palette([page.path for page in pages])
+        self.fp = open(save_path, "wb")
+        self.writer = GifWriter(self.fp, self.size, self.palette)
+        self.paths = [save_path]
+
+    def add(self, index, img):
+        if isinstance(img, BandedImage):
+            img = img.load()
+        frame = quantize_frame(img, self.tracer, self.palette, self.size)
+        with self.tracer.stage("write", page=index, format="gif"):
+            self.writer.add_frame(frame, self.duration)
+
+    @property
+    def bytes_written(self):
+        return os.path.getsize(self.save_path)
+
+    def close(self):
+        self.writer.close()
+        self.fp.close()
+
+    def abort(self):
+        self.fp.close()
+        if os.path.exists(self.save_path):
+            os.remove(self.save_path)
+
+
+class SinkThread(threading.Thread):
+    """Feeds one encoder from its queue.
+
+    After an error the queue is still drained, so the producer never blocks.
+    """
+
+    def __init__(self, sink):
+        super().__init__(daemon=True)
+        self.sink = sink
+        self.queue = queue.Queue(SINK_QUEUE_DEPTH)
+        self.error = None
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is _ABORT or (item is _DONE and self.error is not None):
+                return
+            if self.error is not None:
+                continue
+            try:
+                if item is _DONE:
+                    self.sink.close()
+                    return
+                self.sink.add(*item)
+            except BaseException as e:
+                self.error = e
+                if item is _DONE:
+                    return
+
+
+def make_sink(fmt, save_path, pages, fit, tracer, duration, frame_size):
+    if fmt == "pdf":
+        return PdfSink(save_path, pages, fit, tracer)
+    if fmt == "gif":
+        return GifSink(save_path, pages, fit, tracer, duration, frame_size)
+    return StitchWriter(save_path, pages, fit, tracer)
+
+
+def export_many(outputs, image_data, progress=None, cancelled=None, workers=1, tracer=None, fit=None,
+                duration=GIF_FRAME_DURATION, frame_size=None):
+    """Writes ``outputs`` (format -> path) from one decode of ``image_data``.
+
+    Returns format -> ExportStats. If any encoder fails, or the export is
+    cancelled, every output is removed and the error is raised.
+    """
+    stages = tracer or NULL_TRACER
+    start = time.perf_counter()
+    reset_peak_rss()
+    pages = [PageSpec(*item) for item in image_data]
+    threads = {}
+    decoded = None
+    try:
+        for fmt, save_path in outputs.items():
+            threads[fmt] = SinkThread(make_sink(fmt, save_path, pages, fit, stages, duration, frame_size))
+        for thread in threads.values():
+            thread.start()
+        decoded = iter_pages(pages, progress, cancelled, workers, tracer=tracer, fit=fit)
+        for index in range(len(pages)):
+            img = next(decoded)
+            for thread in threads.values():
+                if thread.error is not None:
+                    raise thread.error
+                thread.queue.put((index, img))
+            del img
+        for thread in threads.values():
+            thread.queue.put(_DONE)
+        for thread in threads.values():
+            thread.join()
+            if thread.error is not None:
+                raise thread.error
+    except BaseException:
+        if decoded is not None:
+            decoded.close()
+        for thread in threads.values():
+            if thread.is_alive():
+                thread.queue.put(_ABORT)
+                thread.join()
+            thread.sink.abort()
+        raise
+
+    elapsed = time.perf_counter() - start
+    stats = {}
+    for fmt, thread in threads.items():
+        sink = thread.sink
+        stages.add_bytes(written=sink.bytes_written)
+        stats[fmt] = ExportStats(
+            len(pages), sink.bytes_written, peak_rss_mb(), elapsed, getattr(sink, "passthrough_pages", 0),
+            outputs=sink.paths if len(sink.paths) > 1 else None,
+        )
+    return stats
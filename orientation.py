@@ -0,0 +1,17 @@
+"""Rotation rules shared by the GUI and the export engine, with no dependencies.
+
+The GUI needs them to paint cards and previews before Pillow and the export
+engine have been loaded.
+"""
+
+# EXIF Orientation tag -> (mirror left/right first, then rotate clockwise by)
+EXIF_ORIENTATIONS = {
+    1: (False, 0), 2: (True, 0), 3: (False, 180), 4: (True, 180),
+    5: (True, 270), 6: (False, 90), 7: (True, 90), 8: (False, 270),
+}
+
+
+def resolve_orientation(rotation, orientation=1):
+    """Merges the user's rotation with the EXIF orientation into (mirror, clockwise degrees)."""
+    mirror, exif_rotation = EXIF_ORIENTATIONS.get(orientation, (False, 0))
+    return mirror, (exif_rotation + rotation) % 360
@@ -0,0 +1,60 @@
+import os
+import threading
+from collections import OrderedDict
+
+from export_engine import EncodedPage, resolve_orientation
+
+PAGE_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class EncodedPageCache:
+    """Memory LRU of the pages compressed for PDF exports, so a re-export only encodes what changed.
+
+    Pages are keyed by path, mtime, size, output resolution and JPEG quality.
+    The rotation only counts for mirrored pages, whose pixels are turned; any
+    other page is rotated through /Rotate when the PDF is assembled, so
+    turning it reuses the cached stream. JPEGs copied as they are keep no data here: they are
+    simply read again from the source file.
+    """
+
+    def __init__(self, capacity=PAGE_CACHE_BYTES):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.size = 0
+        # Exports run on a worker thread
+        self.lock = threading.Lock()
+
+    def key(self, page, fit=None, quality=None):
+        st = os.stat(page.path)
+        mirror, _clockwise = resolve_orientation(page.rotation, page.orientation)
+        turned = (page.rotation, page.orientation) if mirror else None
+        fit_key = fit.key() if fit else None
+        return os.path.abspath(page.path), st.st_mtime_ns, st.st_size, turned, fit_key, quality
+
+    def get(self, key):
+        with self.lock:
+            page = self.entries.get(key)
+            if page is not None:
+                self.entries.move_to_end(key)
+            return page
+
+    def put(self, key, page):
+        if page.passthrough:
+            page = EncodedPage(None, page.width, page.height, page.mode, passthrough=True)
+        cost = len(page.data or b"")
+        if cost > self.capacity:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.data or b"")
+            self.entries[key] = page
+            self.size += cost
+            while self.size > self.capacity:
+                _key, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted.data or b"")
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
@@ -0,0 +1,96 @@
+# Object 1 is always the catalog and object 2 the page tree, so pages can point
+# at their parent before the tree itself has been written.
+CATALOG_ID = 1
+PAGES_ID = 2
+
+
+def _num(value):
+    """Formats a PDF number with at most two decimals."""
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+class PdfWriter:
+    """Minimal PDF writer that flushes every page to disk as soon as it is added.
+
+    Only the byte offsets of the written objects are kept in memory, so the
+    cost of a document does not grow with the size of its pages.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.pos = 0
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = PAGES_ID + 1
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self.fp.write(data)
+        self.pos += len(data)
+
+    def _reserve_id(self):
+        obj_id = self.next_id
+        self.next_id += 1
+        return obj_id
+
+    def _write_object(self, obj_id, body):
+        self.offsets[obj_id] = self.pos
+        self._write(f"{obj_id} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    def _write_stream(self, obj_id, entries, data):
+        header = f"<< {entries} /Length {len(data)} >>\nstream\n".encode()
+        self._write_object(obj_id, header + data + b"\nendstream")
+
+    def add_jpeg_page(self, data, width, height, mode="RGB", rotate=0, dpi=72, page_size=None):
+        """Adds a page showing a JPEG stream at ``dpi`` (by default one point per pixel).
+
+        ``rotate`` is a clockwise multiple of 90 that viewers apply on display,
+        so rotated pages cost nothing to write. With ``page_size`` (in points)
+        the image is fitted and centred on a page of that size instead.
+        """
+        draw_width, draw_height = width * 72 / dpi, height * 72 / dpi
+        x = y = 0
+        if page_size:
+            page_width, page_height = page_size
+            scale = min(page_width / draw_width, page_height / draw_height)
+            draw_width, draw_height = draw_width * scale, draw_height * scale
+            x, y = (page_width - draw_width) / 2, (page_height - draw_height) / 2
+        else:
+            page_width, page_height = draw_width, draw_height
+        colorspace = {"L": "/DeviceGray", "CMYK": "/DeviceCMYK"}.get(mode, "/DeviceRGB")
+        image_id = self._reserve_id()
+        content_id = self._reserve_id()
+        page_id = self._reserve_id()
+
+        self._write_stream(
+            image_id,
+            f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace {colorspace} /BitsPerComponent 8 /Filter /DCTDecode",
+            data,
+        )
+        self._write_stream(
+            content_id, "",
+            f"q {_num(draw_width)} 0 0 {_num(draw_height)} {_num(x)} {_num(y)} cm /Im0 Do Q".encode(),
+        )
+        self._write_object(
+            page_id,
+            f"<< /Type /Page /Parent {PAGES_ID} 0 R "
+            f"/MediaBox [0 0 {_num(page_width)} {_num(page_height)}] /Rotate {rotate} "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> "
+            f"/Contents {content_id} 0 R >>".encode(),
+        )
+        self.page_ids.append(page_id)
+        self.fp.flush()
+
+    def close(self):
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._write_object(PAGES_ID, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode())
+        self._write_object(CATALOG_ID, f"<< /Type /Catalog /Pages {PAGES_ID} 0 R >>".encode())
+
+        xref_pos = self.pos
+        lines = [f"xref\n0 {self.next_id}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, self.next_id):
+            lines.append(f"{self.offsets[obj_id]:010d} 00000 n \n")
+        self._write("".join(lines).encode())
+        self._write(f"trailer\n<< /Size {self.next_id} /Root {CATALOG_ID} 0 R >>\nstartxref\n{xref_pos}\n%%EOF\n".encode())
+        self.fp.flush()
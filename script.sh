@@ -13,13 +13,15 @@ rm -rf build dist "$PKG_DIR" "${PKG_DIR}.deb"
 
 # 2. Compilação com PyInstaller
 # --collect-all PySide6 garante que os plugins de plataforma (xcb) sejam incluídos
+# --onedir em vez de --onefile: o binário único extrai tudo para /tmp a cada
+# execução, o que sozinho leva segundos antes da janela aparecer
 echo "Compilando binário com PyInstaller..."
-python3 -m PyInstaller --noconsole --onefile \
+python3 -m PyInstaller --noconsole --onedir \
     --name "$BINARY_NAME" \
     --collect-all PySide6 \
     image_merger.py
 
-if [ ! -f "dist/$BINARY_NAME" ]; then
+if [ ! -f "dist/$BINARY_NAME/$BINARY_NAME" ]; then
     echo "Erro: Falha na compilação do binário."
     exit 1
 fi
@@ -28,10 +30,12 @@ fi
 echo "Criando estrutura do diretório .deb..."
 mkdir -p "$PKG_DIR/DEBIAN"
 mkdir -p "$PKG_DIR/usr/bin"
+mkdir -p "$PKG_DIR/usr/lib"
 mkdir -p "$PKG_DIR/usr/share/applications"
 
-# 4. Movendo o binário
-cp "dist/$BINARY_NAME" "$PKG_DIR/usr/bin/"
+# 4. Movendo o binário e suas bibliotecas; /usr/bin recebe só um link
+cp -r "dist/$BINARY_NAME" "$PKG_DIR/usr/lib/$APP_NAME"
+ln -s "/usr/lib/$APP_NAME/$BINARY_NAME" "$PKG_DIR/usr/bin/$BINARY_NAME"
 
 # 5. Criando o arquivo de controle (Dependências críticas incluídas)
 # libxcb-cursor0 é vital para Qt6 no Ubuntu/Mint
@@ -59,7 +63,7 @@ Terminal=false
 EOF
 
 # 7. Ajustando permissões
-chmod 755 "$PKG_DIR/usr/bin/$BINARY_NAME"
+chmod 755 "$PKG_DIR/usr/lib/$APP_NAME/$BINARY_NAME"
 chmod 644 "$PKG_DIR/usr/share/applications/$APP_NAME.desktop"
 
 # 8. Construindo o pacote
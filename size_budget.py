@@ -0,0 +1,230 @@
+"""Fits a PDF or stitched JPG under a file size, e.g. an upload portal's 10 MB.
+
+A few sample pages spread over the queue are decoded once and re-encoded at
+candidate JPEG qualities and scales. Their bytes per pixel, times the pixels
+of every page read from the headers, predicts the size of the whole file, so
+the search never encodes the document itself. Each search round encodes all
+samples, and several qualities when there are cores to spare, side by side
+on a thread pool (Pillow releases the GIL while resizing and encoding). The
+document is then encoded once with the best setting that fits; only when the
+samples misjudged it and the file still ends up too big is it encoded again,
+with the estimates corrected by the miss.
+"""
+import math
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from export_engine import (
+    EXPORTERS, PageFit, PageSpec, encode_jpeg, iter_pages, oriented_size, passes_through, resolve_orientation,
+)
+from large_images import BandedImage
+from tracing import NULL_TRACER
+
+SAMPLE_PAGES = 5
+SAMPLE_PIXELS = 4_000_000  # larger samples are cut down to bands of rows
+SAMPLE_BANDS = 4
+MAX_QUALITY = 90
+GOOD_QUALITY = 60  # below this, shrinking the pages looks better than compressing harder
+MIN_QUALITY = 30
+MIN_SCALE = 0.25
+BUDGET_MARGIN = 0.97  # aim a little under the budget, for the error of the estimate
+PDF_PAGE_BYTES = 600  # objects and xref entry of one PDF page, besides its image
+MAX_PROBES_PER_ROUND = 3
+MAX_PASSES = 2
+
+# quality is None when every page was copied into the PDF as it is
+BudgetResult = namedtuple("BudgetResult", ["target", "quality", "scale", "estimate", "passes", "sample_encodes"])
+
+
+def sample_indexes(count, samples=SAMPLE_PAGES):
+    """Up to ``samples`` page indexes spread evenly from the first page to the last."""
+    if count <= samples:
+        return list(range(count))
+    return sorted({round(i * (count - 1) / (samples - 1)) for i in range(samples)})
+
+
+def sample_rows(img, max_pixels=SAMPLE_PIXELS):
+    """The page itself if it is small enough, else bands of full rows from over its height, stacked."""
+    if img.width * img.height <= max_pixels:
+        return img.load() if isinstance(img, BandedImage) else img
+    rows = max(16, max_pixels // img.width // SAMPLE_BANDS // 16 * 16)
+    bands = max(1, min(SAMPLE_BANDS, img.height // rows))
+    sample = Image.new("RGB", (img.width, rows * bands))
+    for band in range(bands):
+        top = (img.height - rows) * band // max(1, bands - 1)
+        sample.paste(img.crop((0, top, img.width, top + rows)).convert("RGB"), (0, band * rows))
+    return sample
+
+
+def copied_size(pages, fit=None):
+    """Size of a PDF whose pages are all JPEGs copied as they are, or None if some page is not."""
+    total = PDF_PAGE_BYTES * len(pages)
+    for page in pages:
+        mirror, _clockwise = resolve_orientation(page.rotation, page.orientation)
+        with Image.open(page.path) as img:
+            if mirror or not passes_through(img, fit):
+                return None
+        total += os.path.getsize(page.path)
+    return total
+
+
+class SizeModel:
+    """Predicts the size of a whole export at some JPEG quality and scale from sample pages."""
+
+    def __init__(self, fmt, pages, samples, fit, pool):
+        self.page_sizes = [oriented_size(*page) for page in pages]
+        self.samples = samples
+        self.fit = fit or PageFit()
+        self.pool = pool
+        self.overhead = PDF_PAGE_BYTES * len(pages) if fmt == "pdf" else 0
+        self.scaled = {1.0: samples}  # scale -> resized samples
+        self.bpp = {}  # (quality, scale) -> bytes per pixel of the encoded samples
+        self.correction = 1.0  # real size / estimate, once a pass has missed
+        self.encodes = 0
+
+    @classmethod
+    def sample(cls, fmt, pages, fit, pool, cancelled=None, workers=1):
+        """Decodes the sample pages at the export's resolution, in the worker processes."""
+        chosen = [pages[index] for index in sample_indexes(len(pages))]
+        decoded = iter_pages(chosen, None, cancelled, workers, fit=fit)
+        samples = []
+        # Not enumerate(), which would hold on to each whole page
+        for _index in range(len(chosen)):
+            samples.append(sample_rows(next(decoded)))
+        return cls(fmt, pages, samples, fit, pool)
+
+    def _resize(self, scale):
+        def shrink(img):
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            return img.resize(size, Image.LANCZOS)
+
+        if scale not in self.scaled:
+            self.scaled[scale] = list(self.pool.map(shrink, self.samples))
+        return self.scaled[scale]
+
+    def measure(self, probes):
+        """Encodes the samples at every ``(quality, scale)`` not measured yet, all at once."""
+        probes = [probe for probe in dict.fromkeys(probes) if probe not in self.bpp]
+        jobs = [(quality, img) for quality, scale in probes for img in self._resize(scale)]
+        sizes = list(self.pool.map(lambda job: len(encode_jpeg(job[1], job[0]).data), jobs))
+        self.encodes += len(jobs)
+        count = len(self.samples)
+        for number, (quality, scale) in enumerate(probes):
+            pixels = sum(img.width * img.height for img in self.scaled[scale])
+            self.bpp[quality, scale] = sum(sizes[number * count:(number + 1) * count]) / pixels
+
+    def estimate(self, quality, scale):
+        fit = self.fit.scaled(scale)
+        pixels = sum(width * height for width, height in map(fit.target_size, self.page_sizes))
+        return round(self.bpp[quality, scale] * pixels * self.correction) + self.overhead
+
+
+def search(model, limit, probes_per_round=1):
+    """The best ``(quality, scale)`` whose estimate is at most ``limit``.
+
+    Quality comes down to GOOD_QUALITY first, then the pages are shrunk, down
+    to MIN_SCALE, and only then does quality go lower. Within a range, each
+    round splits it at ``probes_per_round`` qualities measured together.
+    Returns None if even the smallest setting does not fit.
+    """
+    def fits(quality, scale):
+        return model.estimate(quality, scale) <= limit
+
+    scale = 1.0
+    model.measure([(MAX_QUALITY, scale), (GOOD_QUALITY, scale)])
+    if fits(MAX_QUALITY, scale):
+        return MAX_QUALITY, scale
+    low, high = GOOD_QUALITY, MAX_QUALITY - 1
+    while not fits(GOOD_QUALITY, scale) and scale > MIN_SCALE:
+        # The size goes roughly with the pixel count, so the square root of the excess
+        guess = scale * math.sqrt(limit / model.estimate(GOOD_QUALITY, scale))
+        scale = max(MIN_SCALE, min(round(guess, 2), scale - 0.01))
+        model.measure([(GOOD_QUALITY, scale)])
+        high = MAX_QUALITY
+    if not fits(GOOD_QUALITY, scale):
+        model.measure([(MIN_QUALITY, scale)])
+        if not fits(MIN_QUALITY, scale):
+            return None
+        low, high = MIN_QUALITY, GOOD_QUALITY - 1
+    while low < high:
+        step = (high - low) / (probes_per_round + 1)
+        qualities = sorted({min(high, low + max(1, round(step * n))) for n in range(1, probes_per_round + 1)})
+        model.measure([(quality, scale) for quality in qualities])
+        for quality in qualities:
+            if not fits(quality, scale):
+                high = quality - 1
+                break
+            low = quality
+    return low, scale
+
+
+def plan(model, target_bytes, probes_per_round=1):
+    """search() for ``target_bytes`` less the margin; raises ValueError if nothing fits."""
+    found = search(model, target_bytes * BUDGET_MARGIN, probes_per_round)
+    if found is None:
+        smallest = model.estimate(MIN_QUALITY, MIN_SCALE)
+        raise ValueError(
+            f"nem com qualidade {MIN_QUALITY} e escala {MIN_SCALE:.0%} o arquivo fica abaixo de "
+            f"{target_bytes / 1e6:.1f} MB (estimativa: {smallest / 1e6:.1f} MB)"
+        )
+    return found
+
+
+def export_within(fmt, image_data, save_path, target_bytes, progress=None, cancelled=None, workers=1,
+                  tracer=None, fit=None, **options):
+    """Exports a PDF or stitched JPG of at most ``target_bytes``, as sharp as that allows.
+
+    The result's ExportStats carries a BudgetResult with the chosen quality
+    and scale. A stitch split into parts is budgeted as a whole. If even the
+    corrected pass comes out too big, its files are removed and ValueError
+    is raised: a budgeted export never succeeds over the budget.
+    """
+    if fmt not in ("pdf", "jpg"):
+        raise ValueError(f"o limite de tamanho vale para PDF e JPG, não para {fmt.upper()}")
+    stages = tracer or NULL_TRACER
+    start = time.perf_counter()
+    exporter = EXPORTERS[fmt]
+    pages = [PageSpec(*item) for item in image_data]
+
+    # JPEGs that already fit are copied as they are, not encoded again
+    copied = copied_size(pages, fit) if fmt == "pdf" else None
+    if copied is not None and copied <= target_bytes:
+        stats = exporter(image_data, save_path, progress, cancelled, workers, tracer, fit=fit, **options)
+        if stats.bytes_written <= target_bytes:
+            stats.budget = BudgetResult(target_bytes, None, 1.0, copied, 1, 0)
+            return stats
+
+    workers = max(1, workers)
+    with ThreadPoolExecutor(workers) as pool:
+        with stages.stage("budget"):
+            model = SizeModel.sample(fmt, pages, fit, pool, cancelled, workers)
+            probes = max(1, min(MAX_PROBES_PER_ROUND, workers // len(model.samples)))
+            quality, scale = plan(model, target_bytes, probes)
+        for passes in range(1, MAX_PASSES + 1):
+            estimate = model.estimate(quality, scale)
+            stats = exporter(
+                image_data, save_path, progress, cancelled, workers, tracer,
+                fit=model.fit.scaled(scale), quality=quality, **options
+            )
+            if stats.bytes_written <= target_bytes:
+                break
+            # Also the parts of a split stitch that the next pass may not write again
+            for path in stats.outputs or [save_path]:
+                os.remove(path)
+            if passes == MAX_PASSES:
+                raise ValueError(
+                    f"com qualidade {quality} e escala {scale:.0%} o arquivo ficou com "
+                    f"{stats.bytes_written / 1e6:.1f} MB, acima do limite de {target_bytes / 1e6:.1f} MB"
+                )
+            # The samples misjudged the other pages: correct every estimate by the miss
+            model.correction *= stats.bytes_written / estimate
+            with stages.stage("budget"):
+                quality, scale = plan(model, target_bytes, probes)
+    stats.budget = BudgetResult(target_bytes, quality, scale, estimate, passes, model.encodes)
+    # Planning and any second pass included
+    stats.elapsed = time.perf_counter() - start
+    return stats
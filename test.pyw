@@ -2,14 +2,16 @@ import sys
 import os
 import pathlib
 import threading
-from PIL import Image
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
     QPushButton, QFrame, QFileDialog, QListWidget, QListWidgetItem,
     QAbstractItemView, QGraphicsDropShadowEffect
 )
 from PySide6.QtCore import Qt, QSize, QPropertyAnimation, QEasingCurve, QPoint, Signal, Property
-from PySide6.QtGui import QIcon, QPixmap, QColor, QDragEnterEvent, QDropEvent, QTransform, QFont
+from PySide6.QtGui import QIcon, QPixmap, QImage, QColor, QDragEnterEvent, QDropEvent, QTransform, QFont
+
+from export_engine import export
+from thumbnails import ThumbnailCache
 
 # --- CONFIGURAÇÃO VISUAL CIANO HIGH-TECH ---
 BG_COLOR = "#080808"
@@ -73,6 +75,12 @@ STYLE_SHEET = f"""
     }}
 """
 
+thumbnail_cache = ThumbnailCache()
+
+def to_qpixmap(img):
+    data = img.tobytes()
+    return QPixmap.fromImage(QImage(data, img.width, img.height, img.width * 4, QImage.Format_RGBA8888))
+
 class ImageCardWidget(QFrame):
     rotationChanged = Signal()
 
@@ -156,7 +164,11 @@ class ImageCardWidget(QFrame):
         self.rotationChanged.emit()
 
     def update_thumbnail(self):
-        pixmap = QPixmap(self.file_path)
+        thumb = thumbnail_cache.get(self.file_path)
+        if thumb is None:
+            self.thumb_label.setPixmap(QPixmap())
+            return
+        pixmap = to_qpixmap(thumb)
         if self.rotation != 0:
             pixmap = pixmap.transformed(QTransform().rotate(self.rotation), Qt.SmoothTransformation)
         self.thumb_label.setPixmap(pixmap.scaled(65, 65, Qt.KeepAspectRatio, Qt.SmoothTransformation))
@@ -340,34 +352,15 @@ class ImageMergerCyanEngine(QWidget):
             w = self.image_list.itemWidget(self.image_list.item(i))
             image_data.append((w.file_path, w.rotation))
             
-        processed = []
-        for path, rot in image_data:
-            img = Image.open(path).convert("RGB")
-            if rot != 0: img = img.rotate(-rot, expand=True)
-            processed.append(img)
-        
         path_save, _ = QFileDialog.getSaveFileName(self, "Salvar", f"export.{fmt}", f"*{fmt}")
         if not path_save: return
             
         try:
             self.status_bar.setText(f"PROCESSANDO {fmt.upper()}...")
             QApplication.processEvents()
-            
-            if fmt == "jpg":
-                w_max = max(i.size[0] for i in processed)
-                h_total = sum(i.size[1] for i in processed)
-                new_img = Image.new('RGB', (w_max, h_total), (255, 255, 255))
-                y = 0
-                for im in processed:
-                    new_img.paste(im, (0, y))
-                    y += im.size[1]
-                new_img.save(path_save, "JPEG", quality=90)
-            elif fmt == "gif":
-                processed[0].save(path_save, save_all=True, append_images=processed[1:], duration=500, loop=0)
-            elif fmt == "pdf":
-                processed[0].save(path_save, save_all=True, append_images=processed[1:])
-                
-            self.status_bar.setText(f"SUCESSO: {os.path.basename(path_save)}")
+            stats = export(fmt, image_data, path_save)
+            saved = stats.outputs[0] if stats.outputs else path_save
+            self.status_bar.setText(f"SUCESSO: {os.path.basename(saved)}")
         except Exception as e:
             self.status_bar.setText(f"ERRO: {str(e)[:30]}")
 
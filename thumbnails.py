@@ -0,0 +1,179 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+THUMB_SIZE = 130  # twice the card size, so thumbnails stay sharp on HiDPI screens
+DISK_CAPACITY = 256 * 1024 * 1024  # bytes of PNGs kept in the cache directory
+PRUNE_TO = 0.8  # pruning goes down to this share of the capacity, so it runs rarely
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "image-merger", "thumbnails"
+)
+
+
+def decode_reduced(path, size):
+    """Decodes ``path`` at roughly ``size`` pixels on the long side.
+
+    Nothing is decoded at full resolution if it can be avoided: JPEGs are
+    scaled by libjpeg during the DCT, and large_images.decode_at picks
+    embedded thumbnails, TIFF pyramid levels or band-wise reduction for
+    the rest.
+    """
+    # Imported here, so the GUI can create its caches before Pillow is loaded
+    from PIL import Image
+
+    from large_images import decode_at
+
+    with Image.open(path) as img:
+        scale = min(1, size / max(img.size))
+        target = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        thumb = decode_at(img, target, embedded=True)
+        thumb.thumbnail((size, size), Image.LANCZOS)
+        return thumb.convert("RGBA")
+
+
+class ThumbnailCache:
+    """Two-level (memory LRU + disk LRU) cache of unrotated thumbnails.
+
+    Entries are keyed by path, mtime and size, so an edited file gets a fresh
+    thumbnail while an untouched one is never decoded twice. Rotations are
+    applied by the caller to the small cached image. Disk entries are touched
+    when read, and the least recently used are removed once the directory
+    holds more than ``disk_capacity`` bytes, which also clears out the
+    thumbnails of edited files. Without a ``cache_dir`` only the memory
+    level is used. Files that fail to decode are remembered with their
+    error under the same key, so they are not decoded again until they
+    change.
+    """
+
+    def __init__(self, size=THUMB_SIZE, capacity=2048, cache_dir=CACHE_DIR, disk_capacity=DISK_CAPACITY):
+        self.size = size
+        self.capacity = capacity
+        self.cache_dir = cache_dir
+        self.disk_capacity = disk_capacity
+        self.disk_bytes = None  # counted from the directory on the first write
+        self.memory = OrderedDict()
+        self.failures = {}  # key -> the OSError its decode raised
+        # get() is called from the GUI's thumbnail thread pool
+        self.lock = threading.Lock()
+        self.disk_lock = threading.Lock()
+
+    def key(self, path):
+        st = os.stat(path)
+        raw = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{self.size}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".png")
+
+    def _remember(self, key, thumb):
+        with self.lock:
+            self.memory[key] = thumb
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.capacity:
+                self.memory.popitem(last=False)
+
+    def _store(self, key, thumb):
+        if self.cache_dir is None:
+            return
+        disk_path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+            # Write to a temp file first so a crash never leaves a truncated PNG
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(disk_path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as fp:
+                thumb.save(fp, "PNG")
+            os.replace(tmp_path, disk_path)
+            self._account(os.path.getsize(disk_path))
+        except OSError:
+            pass  # the disk cache is best effort
+
+    def _disk_entries(self):
+        """``(mtime, size, path)`` of every PNG in the cache directory."""
+        entries = []
+        for folder in os.scandir(self.cache_dir):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                if entry.name.endswith(".png"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _account(self, added):
+        """Counts a new PNG and, over disk_capacity, removes the least recently used ones."""
+        with self.disk_lock:
+            if self.disk_bytes is None:
+                self.disk_bytes = sum(size for _mtime, size, _path in self._disk_entries())
+            else:
+                self.disk_bytes += added
+            if self.disk_bytes <= self.disk_capacity:
+                return
+            entries = sorted(self._disk_entries())
+            total = sum(size for _mtime, size, _path in entries)
+            for _mtime, size, path in entries:
+                if total <= self.disk_capacity * PRUNE_TO:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+            self.disk_bytes = total
+
+    def cached(self, path):
+        """Returns the thumbnail only if it is already in memory; never decodes."""
+        try:
+            key = self.key(path)
+        except OSError:
+            return None
+        with self.lock:
+            return self.memory.get(key)
+
+    def failed(self, path):
+        """Returns the error of the last failed decode of ``path`` as it is now, or None."""
+        try:
+            key = self.key(path)
+        except OSError as e:
+            return e
+        with self.lock:
+            return self.failures.get(key)
+
+    def get(self, path):
+        """Returns the RGBA thumbnail for ``path``, or None if it cannot be read."""
+        try:
+            key = self.key(path)
+        except OSError:
+            return None
+
+        with self.lock:
+            if key in self.failures:
+                return None
+            thumb = self.memory.get(key)
+            if thumb is not None:
+                self.memory.move_to_end(key)
+                return thumb
+
+        from PIL import Image
+
+        try:
+            if self.cache_dir is None:
+                raise FileNotFoundError(key)
+            disk_path = self._disk_path(key)
+            with Image.open(disk_path) as cached:
+                thumb = cached.convert("RGBA")
+            # The mtime is the disk level's recency
+            os.utime(disk_path)
+        except OSError:
+            try:
+                thumb = decode_reduced(path, self.size)
+            except OSError as e:
+                with self.lock:
+                    # Without the traceback, whose frames hold the half-decoded image
+                    self.failures[key] = e.with_traceback(None)
+                return None
+            self._store(key, thumb)
+
+        self._remember(key, thumb)
+        return thumb
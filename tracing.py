@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class Tracer:
+    """Records how long each pipeline stage takes and how many bytes move through it.
+
+    Timestamps come from the system-wide monotonic clock, so events recorded in
+    the export worker processes can be merged into the parent's tracer. The
+    result can be dumped as a Chrome trace (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, **default_args):
+        self.default_args = default_args
+        self.started = time.monotonic()
+        self.events = []  # (name, start, duration, pid, tid, args)
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.pages = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, **args):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            event = (name, start, time.monotonic() - start, os.getpid(), threading.get_ident(),
+                     {**self.default_args, **args})
+            with self.lock:
+                self.events.append(event)
+
+    def add_bytes(self, read=0, written=0):
+        with self.lock:
+            self.bytes_read += read
+            self.bytes_written += written
+
+    def page_done(self):
+        with self.lock:
+            self.pages += 1
+
+    def merge(self, events, bytes_read=0, bytes_written=0):
+        """Adds events recorded by another tracer, typically in a worker process."""
+        with self.lock:
+            self.events.extend(events)
+            self.bytes_read += bytes_read
+            self.bytes_written += bytes_written
+
+    def throughput(self):
+        """Returns (pages/sec, MB/s read) since the tracer was created."""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return self.pages / elapsed, self.bytes_read / elapsed / 1e6
+
+    def summary(self):
+        stages = {}
+        for name, _start, duration, _pid, _tid, _args in self.events:
+            total, count = stages.get(name, (0.0, 0))
+            stages[name] = (total + duration, count + 1)
+        pages_per_sec, mb_per_sec = self.throughput()
+        return {
+            "elapsed_s": round(time.monotonic() - self.started, 4),
+            "pages": self.pages,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "pages_per_sec": round(pages_per_sec, 2),
+            "read_mb_per_sec": round(mb_per_sec, 2),
+            "stages": {
+                name: {"total_s": round(total, 4), "count": count, "mean_ms": round(total / count * 1000, 3)}
+                for name, (total, count) in sorted(stages.items())
+            },
+        }
+
+    def dump(self, path):
+        """Writes a Chrome trace with the summary alongside the events."""
+        trace_events = [
+            {
+                "name": name, "cat": "image-merger", "ph": "X",
+                "ts": round((start - self.started) * 1e6, 1), "dur": round(duration * 1e6, 1),
+                "pid": pid, "tid": tid, "args": args,
+            }
+            for name, start, duration, pid, tid, args in self.events
+        ]
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms", "summary": self.summary()}, fp)
+
+
+class NullTracer:
+    """Stands in for Tracer when nothing is being measured."""
+
+    def stage(self, name, **args):
+        return nullcontext()
+
+    def add_bytes(self, read=0, written=0):
+        pass
+
+    def page_done(self):
+        pass
+
+
+NULL_TRACER = NullTracer()